@@ -2,11 +2,37 @@ import argparse
 from typing import List
 from pydantic import BaseModel
 from browser import Browser
-from models.llms import llm_call
-from models.uitars import ui_tars_call
+from models.llms import enable_llm_cache, llm_cache_stats, llm_call
+from models.uitars import (
+    configure_backend,
+    configure_client,
+    configure_prefix_cache,
+    end_session,
+    get_prefix_generator,
+    ui_tars_call,
+)
 from rich.console import Console
 from memory import Memory, Insight
+from network import BlockPolicy
+from history import ConversationHistory
+from memory_context import (
+    RenderedContext,
+    compress_actions,
+    render_episodes,
+    render_summaries,
+)
+from replay import ReplayResult, TrajectoryReplayer, replayable
+from screen_change import LoopStats, ScreenChangeDetector
+from screenshots import ScreenTransform, resize_for_model, screen_hash, to_data_url
+from consolidation import ConsolidationWorker
+from planner import FastPlanner
+from tracing import configure_tracing, disable_tracing, span, traced
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import re
+import time
+import uuid
 
 from models.prompts import common_browser_system_prompt, planner_prompt
 
@@ -17,30 +43,96 @@ class Action(BaseModel):
 
 
 class Agent:
-    def __init__(self):
-        self.browser = Browser()
+    def __init__(
+        self,
+        browser: Browser | None = None,
+        headless: bool = False,
+        max_pixels: int | None = 1280 * 28 * 28,
+        history_token_budget: int = 8000,
+        memory_token_cap: int = 800,
+        max_wait_polls: int = 3,
+        block_resources: bool = False,
+        network_archive: str | None = None,
+        network_mode: str = "replay",
+        memory: Memory | None = None,
+    ):
+        """`max_pixels` caps the screenshot size sent to UI-TARS (None sends it
+        at full resolution); clicks are mapped back to the real viewport.
+        `history_token_budget` bounds the prompt of every step and
+        `memory_token_cap` each block of memory rendered into a prompt.
+        After a `wait` that changed nothing, the screen is re-checked up to
+        `max_wait_polls` times before the model is asked again.
+        `block_resources` blocks ads, trackers, media and fonts, or whatever
+        the site's policy in memory says, in a browser launched here, and
+        `network_archive` records or replays its traffic (`network_mode`).
+        `memory` defaults to the shared store in .data/."""
+        self.max_pixels = max_pixels
+        self.history_token_budget = history_token_budget
+        self.memory_token_cap = memory_token_cap
+        self.max_wait_polls = max_wait_polls
+        self.loop_stats = LoopStats()
         self.console = Console()
-        self.memory = Memory()
+        self.memory = memory or Memory()
+        self.consolidator = ConsolidationWorker(self.memory)
+        self.planner = FastPlanner(self.memory)
+        self.last_success: bool | None = None  # the evaluation of the last run
+        self.attach_browser(
+            browser
+            or Browser(
+                headless=headless,
+                block_policy=BlockPolicy() if block_resources else None,
+                network_archive=network_archive,
+                network_mode=network_mode,
+            )
+        )
+
+    def attach_browser(self, browser: Browser):
+        """Drive `browser` from now on, e.g. a fresh context leased from a
+        `BrowserPool` for each task. The previous browser is left open."""
+        self.browser = browser
+        if browser.blocker is not None:
+            browser.blocker.policy_source = self._site_policy
+        self.replayer = TrajectoryReplayer(
+            browser,
+            lambda step: self._execute_action(
+                Action(action=step["action"], args=step["args"])
+            ),
+        )
+
+    def _parse_action(
+        self, action: str, transform: ScreenTransform | None = None
+    ) -> Action:
+        """Parse UI-TARS action into our Action format.
+
+        Coordinates are mapped from the image the model saw back to the
+        viewport with `transform`, when the screenshot was downscaled.
+        """
+
+        def point(*keys: str) -> tuple[int, int]:
+            # Accepts "(x,y)", "<point>x y</point>" and "(x1,y1,x2,y2)" boxes.
+            key = next(k for k in keys if f"{k}='" in action)
+            coords = action.split(f"{key}='")[1].split("'")[0]
+            numbers = [float(n) for n in re.findall(r"-?\d+(?:\.\d+)?", coords)]
+            if len(numbers) == 4:
+                x, y = (numbers[0] + numbers[2]) / 2, (numbers[1] + numbers[3]) / 2
+            else:
+                x, y = numbers[0], numbers[1]
+            if transform is not None:
+                return transform.to_viewport(x, y)
+            return round(x), round(y)
 
-    def _parse_action(self, action: str) -> Action:
-        """Parse UI-TARS action into our Action format."""
         if action.startswith("click"):
-            coords = action.split("start_box='")[1].split("'")[0]
-            x, y = map(int, coords.strip("()").split(","))
+            x, y = point("start_box", "point")
             return Action(action="click", args={"x": str(x), "y": str(y)})
         elif action.startswith("left_double"):
-            coords = action.split("start_box='")[1].split("'")[0]
-            x, y = map(int, coords.strip("()").split(","))
+            x, y = point("start_box", "point")
             return Action(action="left_double", args={"x": str(x), "y": str(y)})
         elif action.startswith("right_single"):
-            coords = action.split("start_box='")[1].split("'")[0]
-            x, y = map(int, coords.strip("()").split(","))
+            x, y = point("start_box", "point")
             return Action(action="right_single", args={"x": str(x), "y": str(y)})
         elif action.startswith("drag"):
-            start_coords = action.split("start_box='")[1].split("'")[0]
-            end_coords = action.split("end_box='")[1].split("'")[0]
-            start_x, start_y = map(int, start_coords.strip("()").split(","))
-            end_x, end_y = map(int, end_coords.strip("()").split(","))
+            start_x, start_y = point("start_box", "start_point")
+            end_x, end_y = point("end_box", "end_point")
             return Action(
                 action="drag",
                 args={
@@ -57,12 +149,7 @@ class Agent:
             content = action.split("content='")[1].split("'")[0]
             return Action(action="type", args={"content": content})
         elif action.startswith("scroll"):
-            if "point='" in action:
-                coords = action.split("point='")[1].split("'")[0]
-                x, y = map(int, coords.strip("()").split(","))
-            else:
-                coords = action.split("start_box='")[1].split("'")[0]
-                x, y = map(int, coords.strip("()").split(","))
+            x, y = point("point", "start_box")
             direction = action.split("direction='")[1].split("'")[0]
             return Action(
                 action="scroll", args={"x": str(x), "y": str(y), "direction": direction}
@@ -78,6 +165,47 @@ class Agent:
         else:
             raise ValueError(f"Invalid action: {action}")
 
+    def _site_policy(self, host: str) -> BlockPolicy | None:
+        policy = self.memory.get_site_policy(host)
+        return BlockPolicy(**policy) if policy else None
+
+    def _report_navigation(self):
+        report = self.browser.last_navigation
+        if report is None:
+            return
+        self.console.print(
+            f"[blue]Loaded[/blue] {report.url} in {report.load_ms:.0f} ms:"
+            f" blocked {report.requests_blocked} requests"
+            f" (~{report.bytes_blocked_estimate / 1024:.0f} KiB,"
+            f" ~{report.saved_ms_estimate:.0f} ms saved)",
+            style="dim",
+        )
+
+    def _report_context(self, label: str, context: RenderedContext):
+        self.console.print(
+            f"[blue]{label}:[/blue] {context.tokens} tokens"
+            f" ({context.saved_tokens} saved)",
+            style="dim",
+        )
+
+    @staticmethod
+    def _summarize_action(action: Action, success: bool) -> str:
+        args = ", ".join(f"{key}={value!r}" for key, value in action.args.items())
+        return f"{action.action}({args})" + ("" if success else " [failed]")
+
+    @traced("agent.prepare_screenshot")
+    def _prepare_screenshot(self, state) -> tuple[str, ScreenTransform | None]:
+        """Downscale the screenshot to the model's pixel budget."""
+        if self.max_pixels is None:
+            return state.page_screenshot_base64, None
+        data, transform = resize_for_model(
+            state.screenshot,
+            state.screenshot_mime_type,
+            self.max_pixels,
+            self.browser.screenshot_quality,
+        )
+        return to_data_url(data, state.screenshot_mime_type), transform
+
     def _execute_action(self, action: Action):
         try:
             if action.action == "click":
@@ -109,6 +237,7 @@ class Agent:
                 return action.args["content"]
             elif action.action == "goto_url":
                 self.browser.goto_url(action.args["url"])
+                self._report_navigation()
             else:
                 raise ValueError(f"Invalid action: {action.action}")
         except Exception as e:
@@ -116,28 +245,107 @@ class Agent:
             return False
         return True
 
+    def close(self):
+        """Finish pending memory consolidation and close the browser."""
+        self.consolidator.close()
+        self.browser.close()
+
     def run(self, task: str, max_iterations: int = 25):
-        iteration = 0
+        session_id = uuid.uuid4().hex
+        self.last_success = None
+        try:
+            with span("agent.run", task=task, session_id=session_id) as run_span:
+                result = self._run(task, max_iterations, session_id)
+                run_span.set(result=result[:200])
+                return result
+        finally:
+            end_session(session_id)
+            stats = self.loop_stats
+            self.console.print(
+                f"[blue]Wasted steps avoided:[/blue] {stats.wasted_steps_avoided}"
+                f" ({stats.skipped_inferences} inferences, {stats.skipped_actions}"
+                f" no-op actions, {stats.aborted_steps} after aborting;"
+                f" {stats.unchanged_steps} actions changed nothing)",
+                style="dim",
+            )
 
-        procedural_summaries = []
-        for url in set(ep["url"] for ep in self.memory.memory["episodic"] if ep["url"]):
-            procedural_summary = self.memory.get_procedural_summary(url)
-            if procedural_summary != "No successful approaches recorded yet.":
-                procedural_summaries.append(f"Site: {url}\n{procedural_summary}")
+    @traced("agent.plan")
+    def _plan(self, task: str) -> tuple[str, str | None]:
+        """Return the plan and its start URL, from memory when the task is known."""
+        match = self.planner.lookup(task)
+        stats = self.planner.stats
+        if match is not None:
+            self.console.print(
+                f"[blue]Planner fast path:[/blue] matched {match.matched_task!r}"
+                f" (similarity {match.score}, {match.successes}/{match.runs}"
+                f" succeeded); saved ~{stats.mean_llm_seconds:.1f}s,"
+                f" hit rate {stats.hits}/{stats.lookups},"
+                f" {stats.saved_seconds:.1f}s saved in total",
+                style="dim",
+            )
+            return match.plan, match.start_url
+
+        # Only the sites whose summaries are most similar to the task.
+        procedural_summaries = {
+            url: summary
+            for url, summary in self.memory.search_summaries(task, "procedural").items()
+            if summary != "No successful approaches recorded yet."
+        }
+        approaches = render_summaries(
+            task, procedural_summaries, self.memory_token_cap
+        )
+        self._report_context("Planner memory", approaches)
 
+        start = time.perf_counter()
         plan = llm_call(
             prompt=planner_prompt.format(task=task)
             + "\n\nPrevious Successful Approaches:\n"
-            + "\n\n".join(procedural_summaries),
+            + approaches.text,
             model="openai/gpt-4.1-mini",
         )
+        elapsed = time.perf_counter() - start
+        self.planner.record_llm_call(elapsed)
+        self.console.print(
+            f"[blue]Planner:[/blue] LLM call took {elapsed:.1f}s,"
+            f" fast path hit rate {stats.hits}/{stats.lookups}",
+            style="dim",
+        )
 
-        start_url = None
         for line in plan.split("\n"):
             if line.startswith("START_URL:"):
-                start_url = line.split("START_URL:")[1].strip()
-                self.console.print(f"[green]Starting URL:[/green] {start_url}")
-                break
+                return plan, line.split("START_URL:")[1].strip()
+        return plan, None
+
+    @traced("agent.replay", lambda self, task, start_url: {"url": start_url})
+    def _replay(self, task: str, start_url: str) -> ReplayResult | None:
+        """Re-execute the latest recorded successful run of `task`, if any."""
+        trajectory = next(
+            (
+                t
+                for t in self.memory.get_successful_trajectories(task, start_url)
+                if replayable(t)
+            ),
+            None,
+        )
+        if trajectory is None:
+            return None
+        result = self.replayer.replay(trajectory)
+        self.console.print(
+            f"[blue]Replay:[/blue] {result.replayed_steps}/{result.total_steps} steps"
+            f" in {result.seconds:.1f}s"
+            + ("" if result.completed else f", diverged: {result.reason}"),
+            style="dim",
+        )
+        return result
+
+    def _run(self, task: str, max_iterations: int, session_id: str):
+        iteration = 0
+
+        plan, start_url = self._plan(task)
+        if start_url:
+            self.console.print(f"[green]Starting URL:[/green] {start_url}")
+            self.browser.goto_url(start_url)
+            self._report_navigation()
 
         site_summaries = []
         recent_episodes = []
@@ -147,9 +355,19 @@ class Agent:
             if site_summary != "No experience with this site yet.":
                 site_summaries.append(f"Site: {start_url}\n{site_summary}")
 
-            episodes = self.memory.get_recent_episodes(start_url, limit=3)
+            episodes = self.memory.get_recent_episodes(start_url, limit=20)
+            seen = {ep["id"] for ep in episodes}
+            episodes += [
+                ep
+                for ep in self.memory.search(task, k=5, min_score=0.3)
+                if ep["id"] not in seen
+            ]
             if episodes:
-                recent_episodes.extend(episodes)
+                digest = render_episodes(
+                    task, start_url, episodes, self.memory_token_cap
+                )
+                self._report_context("Episode digest", digest)
+                recent_episodes.append(digest.text)
 
             if site_summary != "No experience with this site yet.":
                 self.console.print(f"[blue]Site Experience:[/blue] {site_summary}")
@@ -160,130 +378,179 @@ class Agent:
                     f"[blue]Successful Approaches:[/blue] {procedural_summary}"
                 )
 
-            self.browser.goto_url(start_url)
-
         memory_context = ""
         if site_summaries:
             memory_context += "\n\nSite Patterns and Issues:\n" + "\n\n".join(
                 site_summaries
             )
         if recent_episodes:
-            memory_context += "\n\nRecent Episodes:\n" + json.dumps(
-                recent_episodes, indent=2
-            )
+            memory_context += "\n\nRecent Episodes:\n" + "\n".join(recent_episodes)
 
-        all_messages = [
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": common_browser_system_prompt.format(
-                            language="English", instruction=task
-                        )
-                        + memory_context,
-                    },
-                ],
-            },
-        ]
-
-        all_messages.append(
-            {
-                "role": "user",
-                "content": [{"type": "text", "text": plan}],
-            }
+        history = ConversationHistory(
+            system_prompt=common_browser_system_prompt.format(
+                language="English", instruction=task
+            )
+            + memory_context,
+            plan=plan,
+            token_budget=self.history_token_budget,
+            image_tokens=(self.max_pixels or 1920 * 1080) // (28 * 28),
         )
 
         last_action_success = True
         all_actions = []
         last_action = ""
-        while iteration < max_iterations:
-            iteration += 1
-            state = self.browser.get_state()
-
-            for message in all_messages:
-                if message["role"] == "user":
-                    message["content"] = [
-                        item for item in message["content"] if item["type"] != "image"
-                    ]
-
-            all_messages.append(
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "url": state.page_screenshot_base64,
-                        }
-                    ],
-                }
-            )
-            action, response = ui_tars_call(all_messages)
-            all_messages.append(
-                {
-                    "role": "assistant",
-                    "content": [{"type": "text", "text": response}],
-                }
-            )
 
-            self.console.print(f"[green]Response:[/green] {response}")
+        # Steps replayed from a previous run need no inference; the model
+        # takes over at the first divergence, or to finish the task.
+        note = None
+        replay = self._replay(task, start_url) if start_url else None
+        if replay is not None and replay.executed:
+            all_actions.extend(replay.executed)
+            note = (
+                f"{replay.replayed_steps} steps of a previous successful run were"
+                f" replayed: {compress_actions(replay.executed)}."
+                " Continue from the current screen."
+            )
 
-            action = self._parse_action(action)
-            if action.action == "finished":
-                success_evaluation = (
-                    llm_call(
-                        prompt=f"Evaluate if the following task was completed successfully. Task: {task}\nResult: {action.args['content']}\nRespond with just 'SUCCESS' or 'FAILURE'",
-                        model="openai/gpt-4.1-mini",
+        detector = ScreenChangeDetector()
+        self.loop_stats = detector.stats
+        while iteration < max_iterations:
+            iteration += 1
+            with span("agent.step", iteration=iteration) as step_span:
+                state = self.browser.get_state()
+                screen = screen_hash(state.screenshot)
+                changed = detector.observe(screen)
+                step_span.set(url=state.page_url)
+
+                if changed is False and last_action and last_action.action == "wait":
+                    # The model would almost certainly wait again; poll instead.
+                    for _ in range(self.max_wait_polls):
+                        self.browser.wait()
+                        state = self.browser.get_state()
+                        detector.stats.skipped_inferences += 1
+                        if not detector.same(screen_hash(state.screenshot), screen):
+                            screen, changed = screen_hash(state.screenshot), True
+                            break
+                if changed is False:
+                    previous = self._summarize_action(last_action, True)
+                    note = (
+                        f"The previous action, {previous}, did not change the screen."
                     )
-                    .strip()
-                    .upper()
-                )
-
-                success = success_evaluation == "SUCCESS"
-
-                insights = self.memory._generate_insights(
-                    task=task, result=action.args["content"], success=success
-                )
 
-                self.memory.add_episode(
-                    task=task,
-                    success=success,
-                    trajectory=all_actions,
-                    url=start_url or "",
-                    insights=insights,
+                screenshot_url, transform = self._prepare_screenshot(state)
+                history.add_screenshot(screenshot_url, note)
+                note = None
+                prefix_generator = get_prefix_generator()
+                previous_stats = (
+                    prefix_generator.step_stats[-1]
+                    if prefix_generator is not None and prefix_generator.step_stats
+                    else None
                 )
-
-                chinese_result = action.args["content"]
-                self.console.print(
-                    f"[green]Chinese result:[/green] {chinese_result}", style="dim"
+                action, response = ui_tars_call(
+                    history.messages(), session_id=session_id
                 )
-
-                result = llm_call(
-                    f"Translate the following result into English: {chinese_result}"
+                step = (
+                    prefix_generator.step_stats[-1]
+                    if prefix_generator is not None and prefix_generator.step_stats
+                    else None
                 )
-                return result
+                # Only when this call went through the prefix cache; a fallback
+                # to plain generation records nothing.
+                if (
+                    step is not None
+                    and step is not previous_stats
+                    and step.session_id == session_id
+                ):
+                    self.console.print(
+                        f"[blue]TTFT[/blue] {step.ttft_ms:.0f} ms"
+                        f" ({step.reused_tokens}/{step.prompt_tokens}"
+                        " prompt tokens cached)",
+                        style="dim",
+                    )
 
-            last_action_success = self._execute_action(action)
+                self.console.print(f"[green]Response:[/green] {response}")
 
-            # if action == last_action:
-            #     success_evaluation = "FAILURE"
-            #     insights = self.memory._generate_insights(
-            #         task=task, result="Error: Repeated action", success=False
-            #     )
+                action = self._parse_action(action, transform)
+                step_span.set(action=action.action, screen_changed=changed)
+                if action.action == "finished":
+                    chinese_result = action.args["content"]
+                    self.console.print(
+                        f"[green]Chinese result:[/green] {chinese_result}", style="dim"
+                    )
 
-            #     self.memory.add_episode(
-            #         task=task,
-            #         success=False,
-            #         trajectory=all_actions,
-            #         url=start_url or "",
-            #         insights=insights,
-            #     )
+                    # Evaluation and translation are independent network calls;
+                    # each runs in a copy of this context to nest its span here.
+                    with ThreadPoolExecutor(max_workers=2) as pool:
+                        evaluation = pool.submit(
+                            contextvars.copy_context().run,
+                            llm_call,
+                            prompt=f"Evaluate if the following task was completed successfully. Task: {task}\nResult: {chinese_result}\nRespond with just 'SUCCESS' or 'FAILURE'",
+                            model="openai/gpt-4.1-mini",
+                        )
+                        translation = pool.submit(
+                            contextvars.copy_context().run,
+                            llm_call,
+                            f"Translate the following result into English: {chinese_result}",
+                        )
 
-            #     return "Error: repeated action"
+                        success = evaluation.result().strip().upper() == "SUCCESS"
+                        self.last_success = success
+                        self.consolidator.submit(
+                            task=task,
+                            result=chinese_result,
+                            success=success,
+                            trajectory=all_actions,
+                            url=start_url or "",
+                        )
+                        return translation.result()
+
+                key = self._summarize_action(action, True)
+                noops = detector.noop_count(key, screen)
+                if noops >= detector.max_repeats:
+                    detector.stats.aborted_steps = max_iterations - iteration
+                    self.console.print(
+                        f"[red]Aborting:[/red] {key} had no effect {noops} times"
+                    )
+                    self.last_success = False
+                    self.consolidator.submit(
+                        task=task,
+                        result="Error: repeated action",
+                        success=False,
+                        trajectory=all_actions,
+                        url=start_url or "",
+                    )
+                    return "Error: repeated action"
+                if noops and action.action != "wait":
+                    # Known to do nothing on this screen: don't execute it again.
+                    detector.skipped(key, screen)
+                    history.add_response(response, f"{key} [skipped: had no effect]")
+                    note = f"{key} has no effect on this screen. Try something else."
+                    last_action = action
+                    continue
+
+                last_action_success = self._execute_action(action)
+                detector.executed(key, screen)
+                history.add_response(
+                    response, self._summarize_action(action, last_action_success)
+                )
+                settle = self.browser.last_settle
+                if settle is not None and settle.action == action.action:
+                    self.console.print(
+                        f"[blue]Settled in[/blue] {settle.waited_ms:.0f} ms"
+                        + ("" if settle.settled else " (hit upper bound)"),
+                        style="dim",
+                    )
 
-            if last_action_success:
-                all_actions.append(action.dict())
-            last_action = action
+                if last_action_success:
+                    # The page the action was taken on, so the run can be replayed.
+                    all_actions.append(
+                        {
+                            **action.dict(),
+                            "url": state.page_url,
+                            "screen_hash": screen,
+                        }
+                    )
+                last_action = action
 
         return "Error: max iterations reached"
 
@@ -292,16 +559,105 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--task", type=str, required=True)
     parser.add_argument("--max-iters", type=int, default=25)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument(
+        "--llm-cache", action="store_true", help="Cache LLM responses on disk"
+    )
+    parser.add_argument(
+        "--ui-tars-server",
+        type=str,
+        default=None,
+        help="URL of a running models/uitars_server.py to use instead of loading UI-TARS",
+    )
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="Reuse the conversation prefix's KV cache between steps",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=None,
+        choices=["reference", "cpu-bf16", "cpu-int8"],
+        help="How to load UI-TARS in-process",
+    )
+    parser.add_argument("--num-threads", type=int, default=None)
+    parser.add_argument(
+        "--block",
+        action="store_true",
+        help="Block ads, trackers, media and fonts (per-site policies from memory)",
+    )
+    parser.add_argument(
+        "--network-archive",
+        type=str,
+        default=None,
+        help="Directory to record page traffic to and replay it from",
+    )
+    parser.add_argument(
+        "--network-mode",
+        type=str,
+        default="replay",
+        choices=["record", "replay", "offline"],
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, help="Write timed spans to this JSONL file"
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=None,
+        help="Write a Prometheus text snapshot of span timings to this file",
+    )
+    parser.add_argument(
+        "--live-timings", action="store_true", help="Show a live table of step timings"
+    )
     args = parser.parse_args()
+    if args.trace or args.metrics or args.live_timings:
+        configure_tracing(args.trace, args.metrics, live=args.live_timings)
+    if args.backend:
+        configure_backend(args.backend, num_threads=args.num_threads)
+    if args.prefix_cache and args.ui_tars_server:
+        parser.error(
+            "--prefix-cache applies to in-process inference;"
+            " start the UI-TARS server with --prefix-cache instead"
+        )
+    if args.prefix_cache:
+        configure_prefix_cache()
+    if args.ui_tars_server:
+        configure_client(args.ui_tars_server)
+    if args.llm_cache:
+        enable_llm_cache()
     task = args.task
     console = Console()
     console.print(f"[green]Task:[/green] {task}")
-    agent = Agent()
+    agent = Agent(
+        headless=args.headless,
+        block_resources=args.block,
+        network_archive=args.network_archive,
+        network_mode=args.network_mode,
+    )
     result = agent.run(task, args.max_iters)
     if "Error" not in result:
         console.print(f"[green]Result:[/green] {result}")
     else:
         console.print(f"[red]Error:[/red] {result}.")
+    archive_route = agent.browser.archive_route
+    if archive_route is not None:
+        stats = archive_route.stats
+        console.print(
+            f"[blue]Network archive:[/blue] {stats.hits} served"
+            f" ({stats.fuzzy_hits} fuzzy), {stats.misses} misses,"
+            f" {stats.recorded} recorded",
+            style="dim",
+        )
+    agent.close()
+    disable_tracing()
+    stats = llm_cache_stats()
+    if stats is not None:
+        console.print(
+            f"[blue]LLM cache:[/blue] {stats.hits} hits, {stats.misses} misses",
+            style="dim",
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Any, Dict, List, Set
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+STATUSES = ("done", "timeout", "error")
+
+
+class BatchTask(BaseModel):
+    id: str
+    task: str
+    max_iterations: int | None = None
+
+
+class TaskResult(BaseModel):
+    id: str
+    task: str
+    status: str  # one of STATUSES
+    result: str | None = None
+    success: bool | None = None  # the agent's own evaluation, when it finished
+    error: str | None = None
+    seconds: float
+    worker: int
+    finished_at: str
+
+
+class TaskTimeout(BaseException):
+    """Raised by SIGALRM in whatever the worker is running. Not an
+    `Exception`, so the agent's own error handling can't swallow it."""
+
+
+def load_tasks(path: str) -> List[BatchTask]:
+    """Read tasks from JSONL. Lines in the backlog format (`request_id`,
+    `body`) work as well as `id`/`task`; repeated ids are dropped."""
+    tasks, seen = [], set()
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            task = BatchTask(
+                id=str(record.get("id") or record["request_id"]),
+                task=record.get("task") or record["body"],
+                max_iterations=record.get("max_iterations"),
+            )
+            if task.id not in seen:
+                seen.add(task.id)
+                tasks.append(task)
+    return tasks
+
+
+def completed_ids(path: str, retry_errors: bool = False) -> Set[str]:
+    """Ids that already have a result in `path`. A line cut short when a
+    batch was interrupted is ignored, so its task runs again."""
+    if not os.path.exists(path):
+        return set()
+    ids = set()
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not retry_errors or record["status"] == "done":
+                ids.add(record["id"])
+    return ids
+
+
+class BatchWorker:
+    """Per-process state: a warm Chromium pool, the memory and one `Agent`
+    that is handed a fresh browser context for every task."""
+
+    def __init__(self, settings: Dict[str, Any]):
+        from browser_pool import BrowserPool
+        from memory import Memory
+        from models.llms import enable_llm_cache
+        from models.uitars import configure_client
+        from network import BlockPolicy
+
+        if settings["ui_tars_server"]:
+            configure_client(settings["ui_tars_server"])
+        if settings["llm_cache"]:
+            enable_llm_cache()
+        self.settings = settings
+        self.pool = BrowserPool(
+            headless=True,
+            block_policy=BlockPolicy() if settings["block"] else None,
+            network_archive=settings["network_archive"],
+            network_mode=settings["network_mode"],
+        )
+        self.memory = Memory(settings["memory"])
+        self.agent = None
+
+    def run(self, task: BatchTask) -> TaskResult:
+        from agent import Agent
+
+        def on_alarm(signum, frame):
+            raise TaskTimeout(f"timed out after {self.settings['timeout']}s")
+
+        status, result, error = "done", None, None
+        start = time.perf_counter()
+        previous = signal.signal(signal.SIGALRM, on_alarm)
+        signal.alarm(self.settings["timeout"])
+        try:
+            with self.pool.lease() as browser:
+                if self.agent is None:
+                    self.agent = Agent(browser=browser, memory=self.memory)
+                    self.agent.console.quiet = not self.settings["verbose"]
+                else:
+                    self.agent.attach_browser(browser)
+                self.agent.last_success = None
+                result = self.agent.run(
+                    task.task, task.max_iterations or self.settings["max_iterations"]
+                )
+        except TaskTimeout as e:
+            status, error = "timeout", str(e)
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
+
+        return TaskResult(
+            id=task.id,
+            task=task.task,
+            status=status,
+            result=result,
+            success=self.agent.last_success if self.agent else None,
+            error=error,
+            seconds=round(time.perf_counter() - start, 2),
+            worker=os.getpid(),
+            finished_at=datetime.now().isoformat(),
+        )
+
+    def close(self):
+        """Finish pending memory consolidation and shut the browsers down."""
+        if self.agent is not None:
+            self.agent.consolidator.close()
+        self.pool.close()
+
+
+_worker: BatchWorker | None = None
+
+
+def _init_worker(settings: Dict[str, Any]):
+    global _worker
+    _worker = BatchWorker(settings)
+    # Runs when the executor shuts the process down after the last task.
+    Finalize(_worker, _worker.close, exitpriority=10)
+
+
+def _run_task(task: BatchTask) -> TaskResult:
+    return _worker.run(task)
+
+
+def summarize(results: List[TaskResult], elapsed: float):
+    table = Table("status", "tasks", "succeeded", "mean seconds")
+    for status in STATUSES:
+        rows = [r for r in results if r.status == status]
+        if rows:
+            table.add_row(
+                status,
+                str(len(rows)),
+                str(sum(bool(r.success) for r in rows)),
+                f"{sum(r.seconds for r in rows) / len(rows):.1f}",
+            )
+    console.print(table)
+    if elapsed > 0:
+        console.print(
+            f"[blue]Throughput:[/blue] {len(results) / elapsed * 3600:.0f} tasks/hour"
+            f" ({len(results)} tasks in {elapsed:.0f}s)",
+            style="dim",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a JSONL file of tasks across worker processes"
+    )
+    parser.add_argument(
+        "tasks", type=str, help="JSONL of tasks (id/task or request_id/body)"
+    )
+    parser.add_argument("--out", type=str, required=True, help="Results JSONL")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=int, default=600, help="Seconds per task")
+    parser.add_argument("--max-iters", type=int, default=25)
+    parser.add_argument("--memory", type=str, default=".data/memory.db")
+    parser.add_argument(
+        "--retry-errors",
+        action="store_true",
+        help="Also rerun tasks whose earlier result was a timeout or error",
+    )
+    parser.add_argument("--ui-tars-server", type=str, default=None)
+    parser.add_argument("--llm-cache", action="store_true")
+    parser.add_argument("--block", action="store_true")
+    parser.add_argument("--network-archive", type=str, default=None)
+    parser.add_argument(
+        "--network-mode",
+        type=str,
+        default="replay",
+        choices=["record", "replay", "offline"],
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show agent output")
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.tasks)
+    done = completed_ids(args.out, args.retry_errors)
+    pending = [task for task in tasks if task.id not in done]
+    console.print(
+        f"[green]{len(pending)} tasks to run[/green]"
+        f" ({len(tasks) - len(pending)} already completed in {args.out})"
+    )
+    if not pending:
+        return
+
+    settings = {
+        "timeout": args.timeout,
+        "max_iterations": args.max_iters,
+        "memory": args.memory,
+        "ui_tars_server": args.ui_tars_server,
+        "llm_cache": args.llm_cache,
+        "block": args.block,
+        "network_archive": args.network_archive,
+        "network_mode": args.network_mode,
+        "verbose": args.verbose,
+    }
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    results: List[TaskResult] = []
+    start = time.perf_counter()
+    # Playwright and the model don't survive a fork; start workers fresh.
+    executor = ProcessPoolExecutor(
+        max_workers=min(args.workers, len(pending)),
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(settings,),
+    )
+    try:
+        with open(args.out, "a") as out:
+            futures = [executor.submit(_run_task, task) for task in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                out.write(result.json() + "\n")
+                out.flush()
+                results.append(result)
+                console.print(
+                    f"[{len(results)}/{len(pending)}] {result.id}: {result.status}"
+                    + ("" if result.success is None else f", success={result.success}")
+                    + f" in {result.seconds:.0f}s"
+                )
+        executor.shutdown()
+    except KeyboardInterrupt:
+        console.print("[yellow]Interrupted; rerun the same command to resume.[/yellow]")
+        executor.shutdown(wait=False, cancel_futures=True)
+    except BrokenProcessPool:
+        console.print(
+            "[red]A worker process died; rerun the same command to resume.[/red]"
+        )
+        executor.shutdown(wait=False, cancel_futures=True)
+    summarize(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
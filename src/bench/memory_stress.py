@@ -0,0 +1,182 @@
+import argparse
+import json
+import re
+import tempfile
+import time
+from multiprocessing import get_context
+from typing import Dict, List
+from rich.console import Console
+from rich.table import Table
+
+import memory
+from memory import Insight, Memory
+
+console = Console()
+
+SITES = [f"http://site{i}.test/" for i in range(4)]
+RECONSOLIDATE_EVERY = 10
+TASK = re.compile(r"stress writer \d+ task \d+")
+
+
+def _fake_llm_call(prompt: str, system_prompt=None, response_format=None, model=None):
+    """A "summary" listing every task in the prompt: the new episodes and
+    the previous summary's, so an update lost to a race shows up as a
+    missing task."""
+    time.sleep(0.001)
+    if response_format is not None:
+        return response_format(**{name: [] for name in response_format.model_fields})
+    return "; ".join(sorted(set(TASK.findall(prompt))))
+
+
+def _open_memory(path: str, writers: int, episodes: int) -> Memory:
+    # A window covering every episode, so a rebuild keeps all their tasks too.
+    return Memory(
+        path,
+        reconsolidate_every=RECONSOLIDATE_EVERY,
+        consolidation_window=writers * episodes,
+    )
+
+
+def _writer(path: str, writer: int, writers: int, episodes: int, barrier) -> Dict:
+    """Add `episodes` episodes, then check this long-lived process sees
+    every other writer's episodes too."""
+    memory.llm_call = _fake_llm_call
+    mem = _open_memory(path, writers, episodes)
+    insights = Insight(key_learnings=[], improvement_areas=[], success_factors=[])
+    barrier.wait()
+    start = time.perf_counter()
+    for i in range(episodes):
+        mem.add_episode(
+            task=f"stress writer {writer} task {i}",
+            success=i % 2 == 0,
+            trajectory=[{"action": "click", "args": {"x": str(i), "y": str(writer)}}],
+            url=SITES[i % len(SITES)],
+            insights=insights,
+        )
+        if i % 5 == 0:
+            mem.search(f"stress writer {(writer + 1) % writers} task {i}", k=3)
+            mem.get_task_outcomes(f"stress writer {writer} task 0")
+    seconds = time.perf_counter() - start
+    barrier.wait()  # every writer has finished
+
+    other = (writer + 1) % writers
+    seen = mem.store.count_episodes()
+    outcomes = mem.get_task_outcomes(f"stress writer {other} task 0")
+    hits = mem.search(f"stress writer {other} task {episodes - 1}", k=1)
+    mem.store.close()
+    return {
+        "writer": writer,
+        "seconds": seconds,
+        "seen_episodes": seen,
+        "sees_other_outcomes": sum(runs for _, runs in outcomes.values()),
+        "sees_other_in_index": bool(hits)
+        and hits[0]["task"] == f"stress writer {other} task {episodes - 1}",
+    }
+
+
+def verify(path: str, writers: int, episodes: int, reports: List[Dict]) -> List[str]:
+    """Check the shared memory from a fresh process's point of view."""
+    failures = []
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            json.load(f)  # raises if a write was torn
+    mem = _open_memory(path, writers, episodes)
+    tasks = [ep["task"] for ep in mem.store.get_episodes()]
+    expected = {
+        f"stress writer {w} task {i}" for w in range(writers) for i in range(episodes)
+    }
+    if len(tasks) != len(expected):
+        failures.append(f"{len(tasks)} episodes stored, expected {len(expected)}")
+    if set(tasks) != expected:
+        failures.append(f"{len(expected - set(tasks))} episodes lost")
+    ids = [str(ep["id"]) for ep in mem.store.get_episodes()]
+    missing = [i for i in ids if i not in mem.episode_index]
+    if missing:
+        failures.append(f"{len(missing)} episodes missing from the vector index")
+    if len(mem.episode_index) != len(ids):
+        failures.append(f"{len(mem.episode_index)} index keys for {len(ids)} episodes")
+    for url in SITES:
+        site_episodes = mem.store.get_episodes(url)
+        site_tasks = {ep["task"] for ep in site_episodes}
+        succeeded = {ep["task"] for ep in site_episodes if ep["success"]}
+        for kind, expected_tasks in (
+            ("semantic", site_tasks),
+            ("procedural", succeeded),
+        ):
+            summarized = set(TASK.findall(mem.store.get_summary(kind, url) or ""))
+            if summarized != expected_tasks:
+                failures.append(
+                    f"{kind} summary for {url} is missing"
+                    f" {len(expected_tasks - summarized)} of its episodes"
+                )
+        # One rebuild for the first episode, then one per RECONSOLIDATE_EVERY,
+        # unless the first writer to get the lock already held a multiple.
+        rebuilds = sum(
+            update["kind"] == "semantic" and update["mode"] == "full"
+            for update in mem.get_summary_updates(url)
+        )
+        due = len(site_episodes) // RECONSOLIDATE_EVERY
+        if rebuilds not in (due, due + 1):
+            failures.append(f"{url} was rebuilt {rebuilds} times, expected {due + 1}")
+    for report in reports:
+        if report["seen_episodes"] != len(expected):
+            failures.append(
+                f"writer {report['writer']} saw {report['seen_episodes']} episodes"
+            )
+        if report["sees_other_outcomes"] != 1 or not report["sees_other_in_index"]:
+            failures.append(f"writer {report['writer']} missed another writer's work")
+    mem.store.close()
+    return failures
+
+
+def run(backend: str, writers: int, episodes: int, directory: str) -> bool:
+    path = f"{directory}/{backend}/memory.{'json' if backend == 'json' else 'db'}"
+    context = get_context("spawn")
+    barrier = context.Manager().Barrier(writers)
+    start = time.perf_counter()
+    with context.Pool(writers) as pool:
+        reports = pool.starmap(
+            _writer, [(path, w, writers, episodes, barrier) for w in range(writers)]
+        )
+    elapsed = time.perf_counter() - start
+    failures = verify(path, writers, episodes, reports)
+
+    table = Table("backend", "writers", "episodes", "seconds", "episodes/s", "result")
+    table.add_row(
+        backend,
+        str(writers),
+        str(writers * episodes),
+        f"{elapsed:.1f}",
+        f"{writers * episodes / max(r['seconds'] for r in reports):.0f}",
+        "ok" if not failures else f"[red]{len(failures)} failures[/red]",
+    )
+    console.print(table)
+    for failure in failures:
+        console.print(f"[red]{backend}:[/red] {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write to one memory from many processes and check nothing is lost"
+    )
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--episodes", type=int, default=25, help="Per writer")
+    parser.add_argument(
+        "--backend", type=str, default="both", choices=["json", "sqlite", "both"]
+    )
+    args = parser.parse_args()
+
+    backends = ["json", "sqlite"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as directory:
+        ok = all(
+            [
+                run(backend, args.writers, args.episodes, directory)
+                for backend in backends
+            ]
+        )
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
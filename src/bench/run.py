@@ -0,0 +1,372 @@
+import argparse
+import functools
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+
+from agent import Agent
+from browser import Browser
+from memory import Memory
+from bench.stub_models import ScriptedModels
+
+console = Console()
+
+BENCH_DIR = Path(__file__).parent
+PHASES = ("settle", "screenshot", "prepare", "inference", "parse", "execute")
+
+
+class BenchTask(BaseModel):
+    request_id: str
+    title: str
+    body: str  # the task given to the agent
+    site: str  # start page, relative to the fixture server
+    script: List[str]
+    expect: Dict = {}
+    agent: Dict = {}  # extra Agent arguments
+
+
+class StepTiming(BaseModel):
+    settle_ms: float = 0.0
+    screenshot_ms: float = 0.0
+    prepare_ms: float = 0.0  # downscaling for the model
+    inference_ms: float = 0.0
+    parse_ms: float = 0.0
+    execute_ms: float = 0.0  # excluding the settle wait after the action
+
+
+class TaskRun(BaseModel):
+    request_id: str
+    run: int
+    passed: bool
+    failures: List[str]
+    result: str
+    total_ms: float
+    steps: List[StepTiming]
+    inference_calls: int
+    memory_write_ms: float  # Memory._consolidate, in the background worker
+    store_write_ms: float  # of which the episode insert
+    max_click_error_px: float | None = None
+
+
+def load_tasks(path: str) -> List[BenchTask]:
+    with open(path, "r") as f:
+        return [BenchTask(**json.loads(line)) for line in f if line.strip()]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures(directory: Path) -> ThreadingHTTPServer:
+    """Serve the fixture sites on a free localhost port, in a daemon thread."""
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StepProfiler:
+    """Attributes time to the phases of each agent step by wrapping the
+    browser's and agent's methods on the instances. Times are exclusive:
+    the settle wait inside an action counts as settle, not execute.
+
+    A step starts at the `get_state` that follows a model call.
+    """
+
+    def __init__(self):
+        self.steps: List[StepTiming] = [StepTiming()]
+        self.inference_calls = 0
+        self._stack: List[List[float]] = []  # [start, time spent in children]
+        self._step_done = False
+
+    def wrap(self, phase: str, fn):
+        if phase not in PHASES:
+            return fn
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            frame = [time.perf_counter(), 0.0]
+            self._stack.append(frame)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._stack.pop()
+                elapsed = time.perf_counter() - frame[0]
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+                step = self.steps[-1]
+                ms = (elapsed - frame[1]) * 1000
+                setattr(step, f"{phase}_ms", getattr(step, f"{phase}_ms") + ms)
+                if phase == "inference":
+                    self.inference_calls += 1
+                    self._step_done = True
+
+        return timed
+
+    def attach(self, agent: Agent):
+        browser = agent.browser
+        get_state = browser.get_state
+
+        def new_step_then_get_state():
+            if self._step_done:
+                self.steps.append(StepTiming())
+                self._step_done = False
+            return get_state()
+
+        browser.get_state = new_step_then_get_state
+        browser.take_screenshot = self.wrap("screenshot", browser.take_screenshot)
+        browser._wait_for_load_state = self.wrap(
+            "settle", browser._wait_for_load_state
+        )
+        agent._prepare_screenshot = self.wrap("prepare", agent._prepare_screenshot)
+        agent._parse_action = self.wrap("parse", agent._parse_action)
+        agent._execute_action = self.wrap("execute", agent._execute_action)
+
+
+class MemoryWriteTimer:
+    """Times memory writes until `detach`."""
+
+    def __init__(self, memory: Memory):
+        self.memory = memory
+        self.consolidate_ms = 0.0
+        self.store_ms = 0.0
+        consolidate, add_episode = memory._consolidate, memory.store.add_episode
+
+        def timed_consolidate(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return consolidate(*args, **kwargs)
+            finally:
+                self.consolidate_ms += (time.perf_counter() - start) * 1000
+
+        def timed_add_episode(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return add_episode(*args, **kwargs)
+            finally:
+                self.store_ms += (time.perf_counter() - start) * 1000
+
+        memory._consolidate = timed_consolidate
+        memory.store.add_episode = timed_add_episode
+
+    def detach(self):
+        del self.memory._consolidate
+        del self.memory.store.add_episode
+
+
+def check(
+    task: BenchTask, events: List[Dict], url: str
+) -> tuple[List[str], float | None]:
+    """Compare what the page recorded with the task's expectations."""
+    failures = []
+    clicks = [e for e in events if e["type"] == "click"]
+    errors = [max(abs(e["dx"]), abs(e["dy"])) for e in clicks if e["id"] is not None]
+    max_error = max(errors) if errors else None
+
+    expected = task.expect
+    if "clicks" in expected and [e["id"] for e in clicks] != expected["clicks"]:
+        failures.append(
+            f"clicked {[e['id'] for e in clicks]}, expected {expected['clicks']}"
+        )
+    if "max_click_error_px" in expected and (
+        max_error is None or max_error > expected["max_click_error_px"]
+    ):
+        failures.append(
+            f"clicks landed up to {max_error}px from target centers,"
+            f" allowed {expected['max_click_error_px']}px"
+        )
+    if "path" in expected and not url.split("?")[0].endswith(expected["path"]):
+        failures.append(f"ended on {url}, expected {expected['path']}")
+    if "submitted" in expected and expected["submitted"] not in [
+        e["value"] for e in events if e["type"] == "submit"
+    ]:
+        failures.append(f"never submitted {expected['submitted']!r}")
+    return failures, max_error
+
+
+def run_task(
+    task: BenchTask,
+    base_url: str,
+    memory: Memory,
+    run: int,
+    inference_ms: float,
+    screenshot_format: str,
+) -> TaskRun:
+    browser = Browser(headless=True, screenshot_format=screenshot_format)
+    bench_agent = Agent(browser=browser, memory=memory, **task.agent)
+    profiler = StepProfiler()
+    profiler.attach(bench_agent)
+    writes = MemoryWriteTimer(memory)
+    viewport = browser.active_page.viewport_size
+    models = ScriptedModels(
+        task.script,
+        base_url + task.site,
+        (viewport["width"], viewport["height"]),
+        inference_ms,
+    )
+
+    with models.installed(profiler.wrap):
+        start = time.perf_counter()
+        result = bench_agent.run(task.body, max_iterations=len(task.script) + 2)
+        total_ms = (time.perf_counter() - start) * 1000
+        bench_agent.consolidator.wait()
+
+    events = browser.active_page.evaluate("window.__benchEvents()")
+    failures, max_error = check(task, events, browser.active_page.url)
+    bench_agent.close()
+    writes.detach()
+    return TaskRun(
+        request_id=task.request_id,
+        run=run,
+        passed=not failures,
+        failures=failures,
+        result=result,
+        total_ms=round(total_ms, 1),
+        steps=[
+            StepTiming(**{k: round(v, 2) for k, v in step.dict().items()})
+            for step in profiler.steps
+        ],
+        inference_calls=profiler.inference_calls,
+        memory_write_ms=round(writes.consolidate_ms, 2),
+        store_write_ms=round(writes.store_ms, 2),
+        max_click_error_px=max_error,
+    )
+
+
+def summarize(runs: List[TaskRun]) -> Dict:
+    steps = [step for run in runs for step in run.steps]
+    return {
+        "runs": len(runs),
+        "passed": sum(run.passed for run in runs),
+        "mean_total_ms": round(sum(r.total_ms for r in runs) / len(runs), 1),
+        "mean_step_ms": {
+            phase: round(sum(getattr(s, f"{phase}_ms") for s in steps) / len(steps), 2)
+            for phase in PHASES
+        },
+        "mean_memory_write_ms": round(
+            sum(r.memory_write_ms for r in runs) / len(runs), 2
+        ),
+        "inference_calls": sum(r.inference_calls for r in runs),
+    }
+
+
+def compare(current: Dict, baseline: Dict):
+    table = Table("metric", "baseline", "current", "change")
+    rows = [("mean_total_ms", "mean_total_ms")]
+    rows += [(f"step {phase}_ms", phase) for phase in PHASES]
+    rows += [("mean_memory_write_ms", "mean_memory_write_ms")]
+    for label, key in rows:
+        if label.startswith("step"):
+            before, after = baseline["mean_step_ms"][key], current["mean_step_ms"][key]
+        else:
+            before, after = baseline[key], current[key]
+        change = f"{(after - before) / before:+.0%}" if before else "n/a"
+        table.add_row(label, f"{before:.1f}", f"{after:.1f}", change)
+    console.print(table)
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BENCH_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Agent.run on local fixture sites with scripted models"
+    )
+    parser.add_argument("--tasks", type=str, default=str(BENCH_DIR / "tasks.jsonl"))
+    parser.add_argument("--only", type=str, default=None, help="Comma-separated ids")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Runs per task, sharing memory (later runs exercise the warm paths)",
+    )
+    parser.add_argument(
+        "--inference-ms", type=float, default=0, help="Simulated model latency"
+    )
+    parser.add_argument("--screenshot-format", type=str, default="png")
+    parser.add_argument("--out", type=str, default=".data/bench")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON")
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.tasks)
+    if args.only:
+        tasks = [task for task in tasks if task.request_id in args.only.split(",")]
+
+    server = serve_fixtures(BENCH_DIR / "sites")
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    runs: List[TaskRun] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for task in tasks:
+            memory = Memory(f"{tmp}/{task.request_id}/memory.db")
+            for run in range(args.repeat):
+                runs.append(
+                    run_task(
+                        task,
+                        base_url,
+                        memory,
+                        run,
+                        args.inference_ms,
+                        args.screenshot_format,
+                    )
+                )
+            memory.store.close()
+    server.shutdown()
+
+    table = Table(
+        "task", "run", "passed", "total ms", "steps", "inferences", "memory ms"
+    )
+    for run in runs:
+        table.add_row(
+            run.request_id,
+            str(run.run),
+            "yes" if run.passed else "[red]no[/red]",
+            f"{run.total_ms:.0f}",
+            str(len(run.steps)),
+            str(run.inference_calls),
+            f"{run.memory_write_ms:.1f}",
+        )
+    console.print(table)
+    for run in runs:
+        for failure in run.failures:
+            console.print(f"[red]{run.request_id} (run {run.run}):[/red] {failure}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "revision": _git_revision(),
+        "args": vars(args),
+        "summary": summarize(runs),
+        "runs": [run.dict() for run in runs],
+    }
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    path.write_text(json.dumps(report, indent=2))
+    console.print(f"[green]Saved[/green] {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        compare(report["summary"], baseline["summary"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+// Records what the agent did on a fixture page, for the harness to check.
+// Events survive same-origin navigations through sessionStorage.
+(() => {
+  const KEY = "__bench_events";
+  const events = () => JSON.parse(sessionStorage.getItem(KEY) || "[]");
+  const record = (event) =>
+    sessionStorage.setItem(KEY, JSON.stringify([...events(), event]));
+  window.__benchEvents = events;
+
+  record({ type: "load", path: location.pathname, query: location.search });
+
+  document.addEventListener(
+    "click",
+    (e) => {
+      const target = e.target.closest("[data-target]");
+      if (!target) {
+        record({ type: "click", id: null, x: e.clientX, y: e.clientY });
+        return;
+      }
+      const box = target.getBoundingClientRect();
+      record({
+        type: "click",
+        id: target.dataset.target,
+        // Distance from the target's center, in CSS pixels.
+        dx: Math.round(e.clientX - (box.left + box.width / 2)),
+        dy: Math.round(e.clientY - (box.top + box.height / 2)),
+      });
+      target.classList.add("hit");
+    },
+    true
+  );
+
+  document.addEventListener("submit", (e) => {
+    const input = e.target.querySelector("input");
+    record({ type: "submit", value: input ? input.value : null });
+  });
+})();
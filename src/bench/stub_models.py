@@ -0,0 +1,103 @@
+import base64
+import io
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+import agent
+import memory
+
+COORDINATES = re.compile(r"\((\d+),\s*(\d+)\)")
+
+
+def _last_image_size(messages: list) -> tuple[int, int] | None:
+    from PIL import Image
+
+    for message in reversed(messages):
+        for part in message["content"]:
+            if part.get("type") == "image":
+                data = base64.b64decode(part["url"].split(",", 1)[1])
+                return Image.open(io.BytesIO(data)).size
+    return None
+
+
+def _text(messages: list) -> str:
+    return "\n".join(
+        part.get("text", "") for message in messages for part in message["content"]
+    )
+
+
+class ScriptedModels:
+    """Deterministic stand-ins for `ui_tars_call` and `llm_call`.
+
+    UI-TARS answers with the task's `script` one action per call. Script
+    coordinates are viewport pixels; like the real model, the stand-in
+    answers in the pixels of the screenshot it was sent, so the agent's
+    mapping back to the viewport is exercised. After a trajectory replay it
+    skips straight to the script's final action.
+
+    The LLM names `start_url` when planning, judges every run a success, and
+    otherwise returns placeholder text or an empty structured response.
+    """
+
+    def __init__(
+        self,
+        script: List[str],
+        start_url: str,
+        viewport: tuple[int, int],
+        inference_ms: float = 0,
+    ):
+        self.script = script
+        self.start_url = start_url
+        self.viewport = viewport
+        self.inference_ms = inference_ms
+        self.position = 0
+
+    def ui_tars_call(self, messages, session_id: str | None = None):
+        if self.inference_ms:
+            time.sleep(self.inference_ms / 1000)
+        if "were replayed" in _text(messages[-1:]):
+            self.position = len(self.script) - 1
+        action = self.script[min(self.position, len(self.script) - 1)]
+        self.position += 1
+
+        size = _last_image_size(messages)
+        if size is not None:
+            sx, sy = size[0] / self.viewport[0], size[1] / self.viewport[1]
+            action = COORDINATES.sub(
+                lambda m: f"({round(int(m[1]) * sx)},{round(int(m[2]) * sy)})",
+                action,
+            )
+        return action, f"Thought: scripted step {self.position}.\nAction: {action}"
+
+    def llm_call(
+        self,
+        prompt: str,
+        system_prompt: str | None = None,
+        response_format=None,
+        model: str | None = None,
+    ):
+        if response_format is not None:
+            fields = response_format.model_fields
+            return response_format(**{name: [] for name in fields})
+        if "START_URL" in prompt:
+            return f"START_URL: {self.start_url}"
+        if prompt.startswith("Evaluate"):
+            return "SUCCESS"
+        if prompt.startswith("Translate"):
+            return prompt.split(": ", 1)[1]
+        return "Scripted summary."
+
+    @contextmanager
+    def installed(self, wrap: Callable[[str, Callable], Callable] = lambda _, f: f):
+        """Swap the stand-ins into the agent and memory modules; `wrap` may
+        instrument them (it gets a phase name and the function)."""
+        saved = (agent.ui_tars_call, agent.llm_call, memory.llm_call)
+        agent.ui_tars_call = wrap("inference", self.ui_tars_call)
+        agent.llm_call = wrap("llm", self.llm_call)
+        memory.llm_call = self.llm_call
+        try:
+            yield self
+        finally:
+            agent.ui_tars_call, agent.llm_call, memory.llm_call = saved
@@ -1,53 +1,129 @@
-import base64
 import json
 import os
 import random
 import time
+from functools import cached_property
 from pydantic import BaseModel
-from playwright.sync_api import sync_playwright
-from PIL import Image
+
+from network import BlockPolicy, NavigationReport, RequestBlocker
+from network_archive import NetworkArchive, NetworkArchiveRoute
+from screenshots import MIME_TYPES, ScreenshotArchiver, reencode, to_data_url
+from settle import PageSettler, SettleConfig, SettleResult
+from tracing import annotate, traced
 
 
 class BrowserState(BaseModel):
     page_url: str
-    page_screenshot_base64: str
+    screenshot: bytes
+    screenshot_mime_type: str = "image/png"
+
+    @cached_property
+    def page_screenshot_base64(self) -> str:
+        """Screenshot as a data URL, only encoded when first requested."""
+        return to_data_url(self.screenshot, self.screenshot_mime_type)
 
 
 class Browser:
-    def __init__(self):
-        self.driver = (
-            sync_playwright().start().chromium.launch(headless=False, timeout=120000)
+    def __init__(
+        self,
+        settle_config: SettleConfig | None = None,
+        screenshot_format: str = "png",
+        screenshot_quality: int = 80,
+        archive_dir: str | None = None,
+        headless: bool = False,
+        context=None,
+        block_policy: BlockPolicy | None = None,
+        network_archive: str | None = None,
+        network_mode: str = "replay",
+    ):
+        """Launch a private Chromium, or drive an existing `context` (e.g. one
+        leased from a `BrowserPool`), which is then closed with this browser.
+
+        With a `block_policy`, matching requests are blocked and every
+        `goto_url` produces a `NavigationReport`. With a `network_archive`
+        directory, responses are recorded to it or served from it according
+        to `network_mode` (see `NetworkArchiveRoute`)."""
+        if screenshot_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported screenshot format: {screenshot_format}")
+        self.screenshot_format = screenshot_format
+        self.screenshot_quality = screenshot_quality
+        self.archiver = ScreenshotArchiver(archive_dir) if archive_dir else None
+
+        if context is None:
+            from playwright.sync_api import sync_playwright
+
+            self.driver = (
+                sync_playwright()
+                .start()
+                .chromium.launch(headless=headless, timeout=120000)
+            )
+            self.context = self.driver.new_context()
+        else:
+            self.driver = None
+            self.context = context
+        # Must be attached before the first page so its init script is installed.
+        self.settler = PageSettler(self.context, settle_config)
+        # Registered first so it runs last, after the blocker falls back to it.
+        self.archive_route = (
+            NetworkArchiveRoute(
+                self.context, NetworkArchive(network_archive), network_mode
+            )
+            if network_archive
+            else None
+        )
+        self.blocker = (
+            RequestBlocker(self.context, block_policy) if block_policy else None
         )
-        self.context = self.driver.new_context()
         self.active_page = self.context.new_page()
+        self.settle_log: list[SettleResult] = []
+        self._settled = False
+
+    @property
+    def last_settle(self) -> SettleResult | None:
+        return self.settle_log[-1] if self.settle_log else None
+
+    @property
+    def last_navigation(self) -> NavigationReport | None:
+        if self.blocker is None or not self.blocker.reports:
+            return None
+        return self.blocker.reports[-1]
 
-    def _wait_for_load_state(self):
-        # self.active_page.wait_for_load_state("networkidle")
-        self.active_page.wait_for_timeout(3000)
+    @traced("browser.settle", lambda self, action: {"action": action})
+    def _wait_for_load_state(self, action: str) -> SettleResult:
+        result = self.settler.settle(self.active_page, action)
+        annotate(settled=result.settled)
+        self.settle_log.append(result)
+        self._settled = True
+        return result
 
+    @traced("browser.click", lambda self, x, y: {"x": x, "y": y})
     def click(self, x: int, y: int):
         """Click at specific coordinates."""
         self.active_page.mouse.click(x, y)
-        self._wait_for_load_state()
+        self._wait_for_load_state("click")
 
+    @traced("browser.left_double", lambda self, x, y: {"x": x, "y": y})
     def left_double(self, x: int, y: int):
         """Double click at specific coordinates."""
         self.active_page.mouse.dblclick(x, y)
-        self._wait_for_load_state()
+        self._wait_for_load_state("left_double")
 
+    @traced("browser.right_single", lambda self, x, y: {"x": x, "y": y})
     def right_single(self, x: int, y: int):
         """Right click at specific coordinates."""
         self.active_page.mouse.click(x, y, button="right")
-        self._wait_for_load_state()
+        self._wait_for_load_state("right_single")
 
+    @traced("browser.drag")
     def drag(self, start_x: int, start_y: int, end_x: int, end_y: int):
         """Drag from start to end coordinates."""
         self.active_page.mouse.move(start_x, start_y)
         self.active_page.mouse.down()
         self.active_page.mouse.move(end_x, end_y)
         self.active_page.mouse.up()
-        self._wait_for_load_state()
+        self._wait_for_load_state("drag")
 
+    @traced("browser.hotkey", lambda self, key: {"key": key})
     def hotkey(self, key: str):
         """Press a hotkey combination."""
 
@@ -98,13 +174,18 @@ class Browser:
                 self.active_page.keyboard.up("Alt")
             elif k == "cmd":
                 self.active_page.keyboard.up("Meta")
-        self._wait_for_load_state()
+        self._wait_for_load_state("hotkey")
 
+    @traced("browser.type", lambda self, content: {"chars": len(content)})
     def type(self, content: str):
         """Type content with support for escape characters."""
         self.active_page.keyboard.type(content)
-        self._wait_for_load_state()
+        self._wait_for_load_state("type")
 
+    @traced(
+        "browser.scroll",
+        lambda self, x, y, direction: {"x": x, "y": y, "direction": direction},
+    )
     def scroll(self, x: int, y: int, direction: str):
         """Scroll at specific coordinates in given direction."""
         self.active_page.mouse.move(x, y)
@@ -116,37 +197,67 @@ class Browser:
             self.active_page.mouse.wheel(1000, 0)
         elif direction == "left":
             self.active_page.mouse.wheel(-1000, 0)
-        self._wait_for_load_state()
+        self._wait_for_load_state("scroll")
 
+    @traced("browser.wait")
     def wait(self):
         """Wait for 5 seconds."""
         self.active_page.wait_for_timeout(5000)
 
-    def take_screenshot(self, path: str):
-        """Take a screenshot of the active page."""
-        self.active_page.screenshot(path=path)
-        with open(path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+    @traced("browser.screenshot")
+    def take_screenshot(self, path: str | None = None) -> bytes:
+        """Take an in-memory screenshot of the active page, optionally saving it to `path`."""
+        if self.screenshot_format == "jpeg":
+            data = self.active_page.screenshot(
+                type="jpeg", quality=self.screenshot_quality
+            )
+        else:
+            data = self.active_page.screenshot(type="png")
+            if self.screenshot_format == "webp":
+                data = reencode(data, "webp", self.screenshot_quality)
+
+        if path is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+        elif self.archiver is not None:
+            self.archiver.submit(data, self.screenshot_format)
+        annotate(image_bytes=len(data), format=self.screenshot_format)
+        return data
 
+    @traced("browser.goto_url", lambda self, url: {"url": url})
     def goto_url(self, url: str):
         """Navigate to a URL."""
-        self.active_page.goto(url)
-        self.active_page.wait_for_load_state("networkidle", timeout=120000)
-        self.active_page.wait_for_timeout(6000)
+        if self.blocker is not None:
+            self.blocker.start_navigation(url)
+        start = time.perf_counter()
+        self.active_page.goto(url, wait_until="domcontentloaded", timeout=120000)
+        self._wait_for_load_state("goto_url")
+        if self.blocker is not None:
+            load_ms = (time.perf_counter() - start) * 1000
+            report = self.blocker.finish_navigation(url, load_ms)
+            annotate(requests_blocked=report.requests_blocked)
 
+    @traced("browser.get_state")
     def get_state(self) -> BrowserState:
         """Get current browser state."""
-        self._wait_for_load_state()
+        if not self._settled:
+            self._wait_for_load_state("get_state")
+        self._settled = False
+        annotate(url=self.active_page.url)
 
         return BrowserState(
             page_url=self.active_page.url,
-            page_screenshot_base64=f"data:image/png;base64,{self.take_screenshot(f'../.data/screenshots/screenshot_{time.time()}.png')}",
+            screenshot=self.take_screenshot(),
+            screenshot_mime_type=MIME_TYPES[self.screenshot_format],
         )
 
     def close(self):
         """Close the browser."""
+        if self.archiver is not None:
+            self.archiver.close()
         self.context.close()
-        self.driver.close()
+        if self.driver is not None:
+            self.driver.close()
 
 
 def main():
@@ -0,0 +1,134 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from pydantic import BaseModel
+from playwright.sync_api import sync_playwright
+
+from browser import Browser
+
+
+class PoolStats(BaseModel):
+    launches: int = 0
+    leases: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_lease_ms: float = 0.0
+    max_lease_ms: float = 0.0
+
+    @property
+    def mean_wait_ms(self) -> float:
+        return self.total_wait_ms / self.leases if self.leases else 0.0
+
+    @property
+    def mean_lease_ms(self) -> float:
+        return self.total_lease_ms / self.leases if self.leases else 0.0
+
+
+class BrowserPool:
+    """Keeps `size` Chromium processes warm and leases out isolated contexts.
+
+    Each lease gets a fresh `BrowserContext`, so no cookies or storage leak
+    between tasks. Pass `storage_key` to carry a logged-in session over: the
+    context's `storage_state` is saved on release and restored on the next
+    lease with the same key. One spare context per process is created ahead
+    of time so a lease usually doesn't wait on context creation.
+
+    Playwright's sync API is bound to the thread that started it, so use a
+    pool from a single thread (one pool per worker process).
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        headless: bool = True,
+        launch_timeout: int = 120000,
+        **browser_kwargs: Any,
+    ):
+        self.headless = headless
+        self.launch_timeout = launch_timeout
+        self.browser_kwargs = browser_kwargs
+        self.stats = PoolStats()
+        self._playwright = sync_playwright().start()
+        self._processes = [self._launch() for _ in range(size)]
+        self._active = [0] * size
+        self._last_used = [0.0] * size
+        self._spares: List[Optional[Any]] = [
+            process.new_context() for process in self._processes
+        ]
+        self._storage_states: Dict[str, Dict] = {}
+
+    def _launch(self):
+        self.stats.launches += 1
+        return self._playwright.chromium.launch(
+            headless=self.headless, timeout=self.launch_timeout
+        )
+
+    def _process(self, index: int):
+        """Return a live process for slot `index`, relaunching it if it died."""
+        if not self._processes[index].is_connected():
+            self._processes[index] = self._launch()
+            self._spares[index] = None
+        return self._processes[index]
+
+    @contextmanager
+    def lease(self, storage_key: str | None = None) -> Iterator[Browser]:
+        """Lease a `Browser` on an isolated context for the duration of a task."""
+        start = time.monotonic()
+        # Leases are usually sequential, so break ties on the least recently
+        # used slot; otherwise slot 0 would always win.
+        index = min(
+            range(len(self._processes)),
+            key=lambda i: (self._active[i], self._last_used[i]),
+        )
+        self._last_used[index] = start
+        process = self._process(index)
+
+        storage_state = self._storage_states.get(storage_key) if storage_key else None
+        if storage_state is None and self._spares[index] is not None:
+            context, self._spares[index] = self._spares[index], None
+        else:
+            context = process.new_context(storage_state=storage_state)
+        browser = Browser(context=context, **self.browser_kwargs)
+
+        leased_at = time.monotonic()
+        self._active[index] += 1
+        try:
+            yield browser
+        finally:
+            self._active[index] -= 1
+            if storage_key:
+                self._save_storage_state(storage_key, context)
+            try:
+                browser.close()
+            finally:
+                if self._spares[index] is None and process.is_connected():
+                    self._spares[index] = process.new_context()
+                self._record(
+                    wait_ms=(leased_at - start) * 1000,
+                    lease_ms=(time.monotonic() - leased_at) * 1000,
+                )
+
+    def _save_storage_state(self, storage_key: str, context):
+        """Keep `context`'s session for the next lease with `storage_key`. If
+        the page crashed or the process went away, the previous one is kept."""
+        try:
+            self._storage_states[storage_key] = context.storage_state()
+        except Exception:
+            pass
+
+    def _record(self, wait_ms: float, lease_ms: float):
+        stats = self.stats
+        stats.leases += 1
+        stats.total_wait_ms += wait_ms
+        stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+        stats.total_lease_ms += lease_ms
+        stats.max_lease_ms = max(stats.max_lease_ms, lease_ms)
+
+    def close(self):
+        """Close every context and Chromium process in the pool."""
+        for spare in self._spares:
+            if spare is not None:
+                spare.close()
+        for process in self._processes:
+            process.close()
+        self._playwright.stop()
@@ -0,0 +1,143 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from rich.console import Console
+
+from memory import Memory, MemoryEntry
+from tracing import traced
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ConsolidationWorker:
+    """Generates insights and consolidates finished episodes into memory in the background.
+
+    Every job is journaled in the memory store before it is queued and removed
+    in the same transaction that stores its episode. Jobs left behind by a
+    process that died, or claimed more than `stale_after` seconds ago (its
+    pid may have been reused), are claimed and replayed when a worker starts.
+    A job that has failed `max_attempts` times is dropped.
+    """
+
+    def __init__(
+        self,
+        memory: Memory,
+        max_workers: int = 1,
+        max_attempts: int = 3,
+        stale_after: float = 3600.0,
+    ):
+        self.memory = memory
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.console = Console()
+        self._pid = os.getpid()
+        # A single worker keeps summary updates for the same site in order.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="consolidation"
+        )
+        self._futures: List[Future] = []
+        self._replay_orphaned_jobs()
+
+    def _replay_orphaned_jobs(self):
+        store = self.memory.store
+        jobs = []
+        for owner in store.get_job_owners():
+            if owner == self._pid or _process_alive(owner):
+                continue
+            jobs += store.claim_jobs(owner, self._pid)
+        stale = datetime.now() - timedelta(seconds=self.stale_after)
+        jobs += store.claim_stale_jobs(self._pid, stale.isoformat())
+        if jobs:
+            self.console.print(
+                f"[yellow]Replaying {len(jobs)} interrupted consolidation(s)[/yellow]"
+            )
+        for job in sorted(jobs, key=lambda job: job["id"]):
+            self._futures.append(
+                self._executor.submit(self._run, job["id"], job["payload"])
+            )
+
+    def submit(
+        self,
+        task: str,
+        result: str,
+        success: bool,
+        trajectory: List[Dict[str, Any]],
+        url: str,
+    ) -> Future:
+        """Durably queue a finished episode for consolidation."""
+        payload = {
+            "task": task,
+            "result": result,
+            "success": success,
+            "trajectory": trajectory,
+            "url": url,
+            "timestamp": datetime.now().isoformat(),
+        }
+        job_id = self.memory.store.enqueue_job(self._pid, payload)
+        future = self._executor.submit(self._run, job_id, payload)
+        self._futures.append(future)
+        return future
+
+    @traced(
+        "memory.consolidation_job",
+        lambda self, job_id, payload: {"job_id": job_id, "url": payload["url"]},
+    )
+    def _run(self, job_id: int, payload: Dict[str, Any]):
+        attempts = self.memory.store.start_job(job_id)
+        if attempts is None:
+            return  # another process finished it
+        if attempts > self.max_attempts:
+            # The last attempt never returned, e.g. it crashed the process.
+            self._drop(job_id, payload, attempts - 1, "no attempt completed")
+            return
+        try:
+            insights = self.memory._generate_insights(
+                task=payload["task"],
+                result=payload["result"],
+                success=payload["success"],
+            )
+            entry = MemoryEntry(
+                task=payload["task"],
+                success=payload["success"],
+                trajectory=payload["trajectory"],
+                url=payload["url"],
+                insights=insights,
+                timestamp=payload["timestamp"],
+            )
+            self.memory._consolidate(entry, job_id=job_id)
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                self._drop(job_id, payload, attempts, e)
+            else:
+                # The job stays journaled and is retried by the next process.
+                self.console.print(
+                    f"[red]Consolidation failed (attempt {attempts} of"
+                    f" {self.max_attempts}):[/red] {e}"
+                )
+            raise
+
+    def _drop(self, job_id: int, payload: Dict[str, Any], attempts: int, error):
+        self.memory.store.complete_job(job_id)
+        self.console.print(
+            f"[red]Dropping the consolidation of {payload['task']!r} on"
+            f" {payload['url']} after {attempts} failed attempts:[/red] {error}"
+        )
+
+    def wait(self):
+        """Block until every queued consolidation has finished."""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.exception()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
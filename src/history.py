@@ -0,0 +1,144 @@
+from collections import deque
+from typing import Dict, List
+
+from models.llms import count_tokens
+
+
+class _Turn:
+    def __init__(self, image_url: str, note: str | None):
+        self.image_url = image_url
+        self.note = note
+        self.response: str | None = None
+        self.summary: str | None = None
+        self.tokens = count_tokens(note) if note else 0
+
+
+class ConversationHistory:
+    """Builds the UI-TARS message list for each step under a fixed token budget.
+
+    The system prompt and plan are always sent. Only the last `keep_turns`
+    steps keep their full Thought/Action text, and only the last
+    `keep_screenshots` keep their image. Older steps are collapsed into a
+    one-line-per-step action log, whose oldest lines are dropped if the
+    budget still isn't met. Token counts use tiktoken, an approximation of
+    the UI-TARS tokenizer, and each image is counted as `image_tokens`.
+
+    All bookkeeping is incremental, so building the messages for a step costs
+    the same at step 3 as at step 300.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        plan: str,
+        token_budget: int = 8000,
+        keep_turns: int = 4,
+        keep_screenshots: int = 1,
+        image_tokens: int = 1280,
+    ):
+        self.system_prompt = system_prompt
+        self.plan = plan
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.keep_screenshots = keep_screenshots
+        self.image_tokens = image_tokens
+
+        self._fixed_tokens = count_tokens(system_prompt) + count_tokens(plan)
+        self._turns: deque[_Turn] = deque()
+        self._turn_tokens = 0
+        self._log: deque[tuple[str, int]] = deque()  # (line, tokens)
+        self._log_tokens = 0
+        self._steps = 0
+        self._omitted = 0
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Estimated prompt size of the next `messages()` call."""
+        images = min(self.keep_screenshots, len(self._turns))
+        return (
+            self._fixed_tokens
+            + self._log_tokens
+            + self._turn_tokens
+            + images * self.image_tokens
+        )
+
+    def add_screenshot(self, image_url: str, note: str | None = None):
+        """Start a new step with its screenshot and optional feedback text."""
+        self._turns.append(_Turn(image_url, note))
+        self._turn_tokens += self._turns[-1].tokens
+        self._enforce_budget()
+
+    def add_response(self, response: str, summary: str):
+        """Record the model's response to the current step and a one-line summary of its action."""
+        turn = self._turns[-1]
+        turn.response = response
+        turn.summary = summary
+        tokens = count_tokens(response)
+        turn.tokens += tokens
+        self._turn_tokens += tokens
+        self._enforce_budget()
+
+    def _collapse_oldest_turn(self):
+        turn = self._turns.popleft()
+        self._turn_tokens -= turn.tokens
+        self._steps += 1
+        line = f"Step {self._steps}: {turn.summary or 'no action'}"
+        if turn.note:
+            line += f" ({turn.note})"
+        tokens = count_tokens(line) + 1
+        self._log.append((line, tokens))
+        self._log_tokens += tokens
+
+    def _enforce_budget(self):
+        while len(self._turns) > self.keep_turns and self._turns[0].response:
+            self._collapse_oldest_turn()
+        while self.prompt_tokens > self.token_budget:
+            if len(self._turns) > 1 and self._turns[0].response:
+                self._collapse_oldest_turn()
+            elif self._log:
+                _, tokens = self._log.popleft()
+                self._log_tokens -= tokens
+                self._omitted += 1
+            else:
+                break
+
+    def messages(self) -> List[Dict]:
+        messages = [
+            {
+                "role": "system",
+                "content": [{"type": "text", "text": self.system_prompt}],
+            },
+            {"role": "user", "content": [{"type": "text", "text": self.plan}]},
+        ]
+        if self._log:
+            lines = [line for line, _ in self._log]
+            if self._omitted:
+                lines.insert(0, f"({self._omitted} earlier steps omitted)")
+            messages.append(
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Previous actions:\n" + "\n".join(lines),
+                        }
+                    ],
+                }
+            )
+
+        with_image = len(self._turns) - self.keep_screenshots
+        for i, turn in enumerate(self._turns):
+            content = []
+            if i >= with_image:
+                content.append({"type": "image", "url": turn.image_url})
+            if turn.note:
+                content.append({"type": "text", "text": turn.note})
+            messages.append({"role": "user", "content": content})
+            if turn.response is not None:
+                messages.append(
+                    {
+                        "role": "assistant",
+                        "content": [{"type": "text", "text": turn.response}],
+                    }
+                )
+        return messages
@@ -1,9 +1,15 @@
 import json
-import os
-from typing import Dict, List, Optional, Any
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime
 from pathlib import Path
-from pydantic import BaseModel
-from models.llms import llm_call
+from typing import Dict, List, Optional, Any
+from pydantic import BaseModel, Field
+from models.llms import count_tokens, llm_call
+from memory_store import SUMMARY_KINDS, open_memory_store
+from tracing import traced
+from vector_index import VectorIndex
 
 
 class Insight(BaseModel):
@@ -18,40 +24,98 @@ class MemoryEntry(BaseModel):
     trajectory: List[Dict[str, Any]]
     url: str
     insights: Insight
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+
+def normalize_task(task: str) -> str:
+    """Lowercase a task and reduce it to its words, for exact matching."""
+    return " ".join(re.findall(r"[a-z0-9]+", task.lower()))
+
+
+# Recorded on each trajectory step only so a run can be replayed (replay.py).
+REPLAY_FIELDS = ("url", "screen_hash")
+
+
+def _compact(episodes: List[MemoryEntry]) -> str:
+    """Episodes as compact JSON for summary prompts, without replay fields."""
+    records = []
+    for episode in episodes:
+        record = episode.dict()
+        record["trajectory"] = [
+            {key: value for key, value in step.items() if key not in REPLAY_FIELDS}
+            for step in record["trajectory"]
+        ]
+        records.append(record)
+    return json.dumps(records, separators=(",", ":"))
 
 
 class Memory:
-    def __init__(self, memory_file: str = ".data/memory.json"):
+    def __init__(
+        self,
+        memory_file: str = ".data/memory.db",
+        summary_mode: str = "incremental",
+        reconsolidate_every: int = 10,
+        consolidation_window: int = 50,
+    ):
+        """Open the memory at `memory_file`: a `.json` path uses the single-file
+        store, anything else SQLite (seeded from a sibling memory.json if present).
+
+        In "incremental" `summary_mode` each new episode is folded into the
+        previous summaries; every `reconsolidate_every`-th episode of a site
+        rebuilds them from its latest `consolidation_window` episodes instead.
+        "full" mode always rebuilds.
+
+        Episodes and summaries are also embedded into vector indexes kept in
+        a `.index` directory next to `memory_file`, for `search` and
+        `search_summaries`.
+        """
+        if summary_mode not in ("incremental", "full"):
+            raise ValueError(f"Invalid summary mode: {summary_mode}")
         self.memory_file = memory_file
-        self._ensure_memory_file()
-        self.memory = self._load_memory()
-
-    def _ensure_memory_file(self):
-        """Ensure the memory file and directory exist."""
-        Path(self.memory_file).parent.mkdir(parents=True, exist_ok=True)
-        if not os.path.exists(self.memory_file):
-            self._save_memory(
-                {
-                    "episodic": [],
-                    "semantic": {},  # URL -> summary of site patterns and common issues
-                    "procedural": {},  # URL -> summary of successful approaches
-                }
+        self.summary_mode = summary_mode
+        self.reconsolidate_every = reconsolidate_every
+        self.consolidation_window = consolidation_window
+        self.store = open_memory_store(memory_file)
+
+        index_dir = Path(memory_file).with_suffix(".index")
+        self.episode_index = VectorIndex(index_dir / "episodes")
+        self.summary_index = VectorIndex(index_dir / "summaries")
+        self._backfill_index()
+        self._outcomes = None  # normalized task -> url -> [successes, runs]
+        self._outcomes_version = None  # store.data_version() they reflect
+        self._outcomes_lock = threading.Lock()
+
+    @staticmethod
+    def _episode_text(episode: Dict) -> str:
+        return f"{episode['task']}\n{episode['url']}"
+
+    def _backfill_index(self):
+        """Index episodes and summaries stored before the index existed."""
+        if len(self.episode_index) < self.store.count_episodes():
+            self.episode_index.add_many(
+                [
+                    (str(ep["id"]), self._episode_text(ep))
+                    for ep in self.store.get_episodes()
+                    if str(ep["id"]) not in self.episode_index
+                ]
+            )
+        if len(self.summary_index) == 0:
+            self.summary_index.add_many(
+                [
+                    (f"{kind} {url}", f"{url}\n{summary}")
+                    for url in self.store.get_urls()
+                    for kind in SUMMARY_KINDS
+                    if (summary := self.store.get_summary(kind, url))
+                ]
             )
 
-    def _load_memory(self) -> Dict:
-        """Load memory from JSON file."""
-        try:
-            with open(self.memory_file, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"episodic": [], "semantic": {}, "procedural": {}}
-
-    def _save_memory(self, memory: Optional[Dict] = None):
-        """Save memory to JSON file."""
-        if memory is None:
-            memory = self.memory
-        with open(self.memory_file, "w") as f:
-            json.dump(memory, f, indent=2)
+    @property
+    def memory(self) -> Dict:
+        """Full snapshot in the legacy `{"episodic", "semantic", "procedural"}` shape.
+
+        Reads every episode, so prefer the query methods below on hot paths.
+        """
+        return self.store.export()
 
     def _generate_site_summary(self, url: str, episodes: List[MemoryEntry]) -> str:
         """Generate a human-readable summary of site patterns and common issues."""
@@ -64,11 +128,11 @@ class Memory:
 3. Best practices for interacting with this site
 
 Episodes:
-{json.dumps([ep.dict() for ep in episodes], indent=2)}
+{_compact(episodes)}
 
 Provide a clear, concise summary that would be helpful for future interactions with this site."""
 
-        return llm_call(prompt=prompt, model="openai/gpt-4.1-mini").strip()
+        return self._summarize(url, "semantic", "full", prompt)
 
     def _generate_procedural_summary(
         self, url: str, successful_episodes: List[MemoryEntry]
@@ -83,11 +147,58 @@ Provide a clear, concise summary that would be helpful for future interactions w
 3. Tips for efficiently completing tasks on this site
 
 Successful Episodes:
-{json.dumps([ep.dict() for ep in successful_episodes], indent=2)}
+{_compact(successful_episodes)}
 
 Provide a clear, concise summary that would be helpful for future tasks on this site."""
 
-        return llm_call(prompt=prompt, model="openai/gpt-4.1-mini").strip()
+        return self._summarize(url, "procedural", "full", prompt)
+
+    def _update_site_summary(
+        self, url: str, previous: str, episode: MemoryEntry
+    ) -> str:
+        """Fold a single new episode into the existing site summary."""
+        prompt = f"""Here is the current summary of patterns, common issues and best practices for the website {url}:
+
+{previous}
+
+Update it with what the following new episode shows. Keep everything that is still valid, correct anything it contradicts, and keep the summary concise.
+
+New Episode:
+{_compact([episode])}
+
+Respond with only the updated summary."""
+
+        return self._summarize(url, "semantic", "incremental", prompt)
+
+    def _update_procedural_summary(
+        self, url: str, previous: str, episode: MemoryEntry
+    ) -> str:
+        """Fold a single new successful episode into the existing procedural summary."""
+        prompt = f"""Here is the current summary of successful approaches for the website {url}:
+
+{previous}
+
+Update it with the approach used in the following new successful episode. Keep the most effective strategies and key steps, and keep the summary concise.
+
+New Successful Episode:
+{_compact([episode])}
+
+Respond with only the updated summary."""
+
+        return self._summarize(url, "procedural", "incremental", prompt)
+
+    def _summarize(self, url: str, kind: str, mode: str, prompt: str) -> str:
+        """Run a summary prompt and record its token cost."""
+        model = "openai/gpt-4.1-mini"
+        summary = llm_call(prompt=prompt, model=model).strip()
+        self.store.record_summary_update(
+            url=url,
+            kind=kind,
+            mode=mode,
+            prompt_tokens=count_tokens(prompt, model),
+            completion_tokens=count_tokens(summary, model),
+        )
+        return summary
 
     def _generate_insights(self, task: str, result: str, success: bool) -> Insight:
         """Generate structured insights using LLM."""
@@ -102,6 +213,14 @@ Provide insights about what was learned, what could be improved, and what factor
             prompt=prompt, response_format=Insight, model="openai/gpt-4.1-mini"
         )
 
+    @traced(
+        "memory.add_episode",
+        lambda self, task, success, trajectory, url, insights: {
+            "url": url,
+            "success": success,
+            "steps": len(trajectory),
+        },
+    )
     def add_episode(
         self,
         task: str,
@@ -118,35 +237,163 @@ Provide insights about what was learned, what could be improved, and what factor
             url=url,
             insights=insights,
         )
+        self._consolidate(entry)
 
-        self.memory["episodic"].append(entry.dict())
+    @traced(
+        "memory.consolidate",
+        lambda self, entry, job_id=None: {"url": entry.url, "success": entry.success},
+    )
+    def _consolidate(self, entry: MemoryEntry, job_id: Optional[int] = None):
+        """Store `entry` (completing pending job `job_id` atomically) and update its site's summaries."""
+        url = entry.url
+        # Under the lock, so a concurrent rebuild can't count the episode twice.
+        with self._outcomes_lock:
+            episode_id = self.store.add_episode(entry.dict(), job_id=job_id)
+            if self._outcomes is not None:
+                self._count_outcome(entry.task, url, entry.success)
+        self.episode_index.add(str(episode_id), self._episode_text(entry.dict()))
 
-        url_episodes = [
-            MemoryEntry(**ep) for ep in self.memory["episodic"] if ep["url"] == url
-        ]
+        # Held from reading the previous summaries to storing the new ones, so
+        # concurrent writers on this site don't overwrite each other's update.
+        with self.store.summary_lock(url):
+            previous_semantic = self.store.get_summary("semantic", url)
+            previous_procedural = self.store.get_summary("procedural", url)
+            reconsolidate = (
+                self.summary_mode == "full"
+                or previous_semantic is None
+                # This episode's fixed position among its site's, unlike a fresh
+                # count, which other writers' inserts can move past a multiple.
+                or self.store.count_episodes(url, up_to=episode_id)
+                % self.reconsolidate_every
+                == 0
+            )
 
-        self.memory["semantic"][url] = self._generate_site_summary(url, url_episodes)
+            if reconsolidate:
+                url_episodes = [
+                    MemoryEntry(**ep)
+                    for ep in self.store.get_episodes(
+                        url, limit=self.consolidation_window
+                    )
+                ]
+                successful_episodes = [ep for ep in url_episodes if ep.success]
+                summaries = {
+                    "semantic": self._generate_site_summary(url, url_episodes),
+                    "procedural": self._generate_procedural_summary(
+                        url, successful_episodes
+                    ),
+                }
+            else:
+                summaries = {
+                    "semantic": self._update_site_summary(url, previous_semantic, entry)
+                }
+                if entry.success:
+                    summaries["procedural"] = (
+                        self._update_procedural_summary(url, previous_procedural, entry)
+                        if previous_procedural
+                        else self._generate_procedural_summary(url, [entry])
+                    )
 
-        successful_episodes = [ep for ep in url_episodes if ep.success]
-        self.memory["procedural"][url] = self._generate_procedural_summary(
-            url, successful_episodes
-        )
+            self.store.set_summaries(url, summaries)
+            # Re-adding a key supersedes the site's previous summary vector.
+            self.summary_index.add_many(
+                [
+                    (f"{kind} {url}", f"{url}\n{summary}")
+                    for kind, summary in summaries.items()
+                ]
+            )
 
-        self._save_memory()
+    def get_urls(self) -> List[str]:
+        """Get every site that has at least one recorded episode."""
+        return self.store.get_urls()
 
     def get_site_summary(self, url: str) -> str:
         """Get the semantic summary for a specific site."""
-        return self.memory["semantic"].get(url, "No experience with this site yet.")
+        return (
+            self.store.get_summary("semantic", url)
+            or "No experience with this site yet."
+        )
 
     def get_procedural_summary(self, url: str) -> str:
         """Get the procedural summary for a specific site."""
-        return self.memory["procedural"].get(
-            url, "No successful approaches recorded yet."
+        return (
+            self.store.get_summary("procedural", url)
+            or "No successful approaches recorded yet."
         )
 
+    def get_summary_updates(self, url: Optional[str] = None) -> List[Dict]:
+        """Get the token cost of every summary update, oldest first."""
+        return self.store.get_summary_updates(url)
+
+    def get_site_policy(self, host: str) -> Optional[Dict]:
+        """Get the network blocking policy stored for a site's host, if any."""
+        return self.store.get_site_policy(host)
+
+    def set_site_policy(self, host: str, policy: Dict[str, Any]):
+        self.store.set_site_policy(host, policy)
+
     def get_recent_episodes(self, url: str, limit: int = 5) -> List[Dict]:
         """Get the most recent episodes for a specific site."""
-        episodes = [ep for ep in self.memory["episodic"] if ep["url"] == url]
-        return sorted(episodes, key=lambda x: x.get("timestamp", ""), reverse=True)[
-            :limit
+        return self.store.get_episodes(url, limit=limit)
+
+    def _count_outcome(self, task: str, url: str, success: bool):
+        counts = self._outcomes[normalize_task(task)][url]
+        counts[0] += int(success)
+        counts[1] += 1
+
+    def get_task_outcomes(self, task: str) -> Dict[str, List[int]]:
+        """Get `[successes, runs]` per start URL of past episodes whose task
+        normalizes to the same text as `task`."""
+        with self._outcomes_lock:
+            # Rebuilt when another process has stored episodes since.
+            version = self.store.data_version()
+            if self._outcomes is None or version != self._outcomes_version:
+                self._outcomes = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+                self._outcomes_version = version
+                for past_task, url, success in self.store.get_task_outcomes():
+                    self._count_outcome(past_task, url, success)
+            outcomes = self._outcomes.get(normalize_task(task), {})
+            return {url: list(counts) for url, counts in outcomes.items()}
+
+    def get_successful_trajectories(
+        self, task: str, url: str, limit: int = 50
+    ) -> List[List[Dict]]:
+        """Successful trajectories of `task` started at `url`, newest first."""
+        key = normalize_task(task)
+        return [
+            ep["trajectory"]
+            for ep in self.store.get_episodes(url, limit=limit, success=True)
+            if normalize_task(ep["task"]) == key
+        ]
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Dict]:
+        """Get the `k` episodes whose task is most similar to `query`, best
+        first, each with its similarity as "score"."""
+        hits = [
+            (int(key), score)
+            for key, score in self.episode_index.search(query, k)
+            if score >= min_score
         ]
+        scores = dict(hits)
+        episodes = self.store.get_episodes_by_id(list(scores))
+        return [{**ep, "score": scores[ep["id"]]} for ep in episodes]
+
+    def search_summaries(
+        self,
+        query: str,
+        kind: str = "procedural",
+        k: int = 5,
+        min_score: float = 0.05,
+    ) -> Dict[str, str]:
+        """Get the `kind` summaries of the `k` sites most relevant to `query`."""
+        summaries = {}
+        for key, score in self.summary_index.search(query, 2 * k * len(SUMMARY_KINDS)):
+            key_kind, url = key.split(" ", 1)
+            if score < min_score:
+                break
+            if key_kind == kind and url not in summaries:
+                summary = self.store.get_summary(kind, url)
+                if summary:
+                    summaries[url] = summary
+            if len(summaries) == k:
+                break
+        return summaries
@@ -0,0 +1,145 @@
+import json
+import re
+from collections import OrderedDict
+from typing import Dict, List
+from urllib.parse import urlparse
+from pydantic import BaseModel
+
+from models.llms import count_tokens
+
+STOPWORDS = set(
+    "a an and are as at be by com for from how http https in is it of on or the"
+    " to what with www".split()
+)
+
+
+class RenderedContext(BaseModel):
+    text: str
+    tokens: int
+    baseline_tokens: int  # cost of the previous, uncompressed rendering
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+
+def words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS}
+
+
+def _overlap(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _same_site(a: str, b: str) -> bool:
+    return bool(a) and urlparse(a).netloc == urlparse(b).netloc
+
+
+def compress_actions(trajectory: List[Dict]) -> str:
+    """Render a trajectory as a short action sequence, folding repeats.
+
+    Coordinates are left out: they rarely transfer between visits, while the
+    sequence of action kinds and typed text does.
+    """
+    steps: List[List] = []
+    for step in trajectory:
+        args = step.get("args", {})
+        label = step.get("action", "?")
+        for key in ("content", "key", "direction", "url"):
+            if key in args:
+                label += f" {args[key]!r}"
+        if steps and steps[-1][0] == label:
+            steps[-1][1] += 1
+        else:
+            steps.append([label, 1])
+    return " > ".join(
+        label if count == 1 else f"{label} x{count}" for label, count in steps
+    )
+
+
+def render_episodes(
+    task: str,
+    start_url: str,
+    episodes: List[Dict],
+    token_cap: int,
+    baseline_episodes: int = 3,
+) -> RenderedContext:
+    """Digest of past episodes, most relevant to `task` first, within `token_cap`.
+
+    Episodes with the same action sequence are merged into a single line.
+    The baseline is the previous rendering: the `baseline_episodes` most
+    recent episodes as indented JSON.
+    """
+    task_words = words(task)
+
+    def relevance(episode: Dict) -> float:
+        score = _overlap(task_words, words(episode["task"]))
+        if episode["url"] == start_url:
+            score += 0.5
+        elif _same_site(episode["url"], start_url):
+            score += 0.25
+        return score + (0.25 if episode["success"] else 0.0)
+
+    groups: OrderedDict[str, Dict] = OrderedDict()
+    for episode in sorted(episodes, key=relevance, reverse=True):
+        sequence = compress_actions(episode.get("trajectory", []))
+        group = groups.setdefault(
+            sequence,
+            {"task": episode["task"], "runs": 0, "successes": 0, "learnings": []},
+        )
+        group["runs"] += 1
+        group["successes"] += int(episode["success"])
+        for learning in (episode.get("insights") or {}).get("key_learnings", []):
+            if learning not in group["learnings"] and len(group["learnings"]) < 2:
+                group["learnings"].append(learning)
+
+    recent = sorted(episodes, key=lambda ep: ep.get("timestamp", ""), reverse=True)
+    recent = recent[:baseline_episodes]
+
+    lines, tokens = [], 0
+    for sequence, group in groups.items():
+        outcome = f"{group['successes']}/{group['runs']} succeeded"
+        line = f"- {group['task']} ({outcome}): {sequence or 'no actions'}"
+        if group["learnings"]:
+            line += "\n  Learned: " + "; ".join(group["learnings"])
+        line_tokens = count_tokens(line) + 1
+        if tokens + line_tokens > token_cap:
+            break
+        lines.append(line)
+        tokens += line_tokens
+
+    return RenderedContext(
+        text="\n".join(lines),
+        tokens=tokens,
+        baseline_tokens=count_tokens(json.dumps(recent, indent=2)),
+    )
+
+
+def render_summaries(
+    task: str, summaries: Dict[str, str], token_cap: int
+) -> RenderedContext:
+    """Per-site summaries ranked by overlap with `task`, within `token_cap`."""
+    task_words = words(task)
+    ranked = sorted(
+        summaries.items(),
+        key=lambda item: _overlap(task_words, words(item[0]) | words(item[1])),
+        reverse=True,
+    )
+
+    blocks, tokens = [], 0
+    for url, summary in ranked:
+        block = f"Site: {url}\n{summary}"
+        block_tokens = count_tokens(block) + 2
+        if tokens + block_tokens > token_cap:
+            continue
+        blocks.append(block)
+        tokens += block_tokens
+
+    baseline = "\n\n".join(
+        f"Site: {url}\n{summary}" for url, summary in summaries.items()
+    )
+    return RenderedContext(
+        text="\n\n".join(blocks),
+        tokens=tokens,
+        baseline_tokens=count_tokens(baseline),
+    )
@@ -0,0 +1,696 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from locking import atomic_write, file_lock
+from tracing import traced
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    insights TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_url_timestamp ON episodes (url, timestamp);
+CREATE INDEX IF NOT EXISTS episodes_timestamp ON episodes (timestamp);
+
+-- Kept out of `episodes` so listing episodes never drags full trajectories along.
+CREATE TABLE IF NOT EXISTS trajectories (
+    episode_id INTEGER PRIMARY KEY REFERENCES episodes (id),
+    actions TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,  -- "semantic" or "procedural"
+    summary TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (url, kind)
+);
+
+CREATE TABLE IF NOT EXISTS summary_updates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    mode TEXT NOT NULL,  -- "incremental" or "full"
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summary_updates_url ON summary_updates (url);
+
+-- Per-site network blocking policies, as BlockPolicy JSON.
+CREATE TABLE IF NOT EXISTS site_policies (
+    host TEXT PRIMARY KEY,
+    policy TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Consolidations queued but not yet applied; replayed after a crash.
+CREATE TABLE IF NOT EXISTS pending_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner INTEGER NOT NULL,  -- pid of the process responsible for the job
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,  -- runs started, including failed ones
+    claimed_at TEXT  -- when `owner` took the job or last started running it
+);
+"""
+
+# Columns added to existing tables since their first release.
+MIGRATIONS = {
+    ("pending_jobs", "attempts"): [
+        "ALTER TABLE pending_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+    ],
+    ("pending_jobs", "claimed_at"): [
+        "ALTER TABLE pending_jobs ADD COLUMN claimed_at TEXT",
+        "UPDATE pending_jobs SET claimed_at = created_at",
+    ],
+}
+
+SUMMARY_KINDS = ("semantic", "procedural")
+
+
+def empty_memory() -> Dict:
+    return {
+        "episodic": [],
+        "semantic": {},  # URL -> summary of site patterns and common issues
+        "procedural": {},  # URL -> summary of successful approaches
+    }
+
+
+class SummaryLocks:
+    """Per-URL locks, across threads and processes, held by a writer from
+    reading a site's summaries to storing their update (an LLM call in
+    between), so concurrent writers build on each other's updates."""
+
+    def __init__(self, path: str):
+        self.directory = Path(f"{path}.locks")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    @contextmanager
+    def hold(self, url: str) -> Iterator[None]:
+        with self._guard:
+            lock = self._locks[url]
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        with lock, file_lock(self.directory / f"summary-{name}.lock"):
+            yield
+
+
+class JsonMemoryStore:
+    """The original single-file store: the whole memory lives in one JSON document.
+
+    Safe to share between processes: every write reloads the file under an
+    exclusive lock on a sibling `.lock` file, applies its change and
+    atomically replaces the file. Reads pick up other processes' commits by
+    checking whether the file was replaced since it was last loaded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+        self._summary_locks = SummaryLocks(path)
+        self._stat = None  # (inode, mtime, size) of the file `memory` came from
+        self._external_changes = 0
+        self.memory = empty_memory()
+        self._ensure_memory_file()
+        self._refresh()
+
+    def _ensure_memory_file(self):
+        """Ensure the memory file and directory exist."""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self._lock_path):
+            if not os.path.exists(self.path):
+                self._save_memory(empty_memory())
+
+    def _load_memory(self) -> Dict:
+        """Load memory from JSON file."""
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return empty_memory()
+        except json.JSONDecodeError as e:
+            # Treating it as empty would overwrite every episode on the next save.
+            raise ValueError(f"Memory file {self.path} is corrupt: {e}") from e
+
+    def _file_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _refresh(self) -> Dict:
+        """Reload the file if it was replaced since it was loaded; return the memory."""
+        with self._lock:
+            stat = self._file_stat()
+            if stat != self._stat:
+                self.memory = self._load_memory()
+                if self._stat is not None:
+                    self._external_changes += 1
+                self._stat = stat
+            return self.memory
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Dict]:
+        """Read-modify-write of the whole memory, atomic across processes."""
+        with self._lock, file_lock(self._lock_path):
+            if self._file_stat() != self._stat:
+                self.memory = self._load_memory()
+                self._external_changes += 1
+            # Changed on a copy, so readers holding the current memory never
+            # see a half-applied change and a failed change leaves no trace.
+            memory = copy.deepcopy(self.memory)
+            yield memory
+            self._save_memory(memory)
+            self.memory = memory
+
+    @traced("store.save")
+    def _save_memory(self, memory: Optional[Dict] = None):
+        """Save memory to JSON file."""
+        if memory is None:
+            memory = self.memory
+        atomic_write(self.path, json.dumps(memory, indent=2))
+        self._stat = self._file_stat()
+
+    def data_version(self) -> int:
+        """A number that changes when another process commits a change."""
+        self._refresh()
+        return self._external_changes
+
+    @traced("store.add_episode")
+    def add_episode(self, episode: Dict[str, Any], job_id: Optional[int] = None) -> int:
+        with self._transaction() as memory:
+            memory["episodic"].append(episode)
+            if job_id is not None:
+                self._remove_job(memory, job_id)
+            return len(memory["episodic"])
+
+    def get_episodes(
+        self,
+        url: Optional[str] = None,
+        limit: Optional[int] = None,
+        success: Optional[bool] = None,
+    ) -> List[Dict]:
+        episodes = [
+            {**ep, "id": i}
+            for i, ep in enumerate(self._refresh()["episodic"], start=1)
+            if (url is None or ep["url"] == url)
+            and (success is None or ep["success"] == success)
+        ]
+        episodes = sorted(episodes, key=lambda x: x.get("timestamp", ""), reverse=True)
+        return episodes[:limit] if limit is not None else episodes
+
+    def get_episodes_by_id(self, ids: List[int]) -> List[Dict]:
+        episodic = self._refresh()["episodic"]
+        return [{**episodic[i - 1], "id": i} for i in ids if 0 < i <= len(episodic)]
+
+    def count_episodes(
+        self, url: Optional[str] = None, up_to: Optional[int] = None
+    ) -> int:
+        """Episodes (of `url`) with an id no greater than `up_to`, if given."""
+        episodes = self.get_episodes(url)
+        if up_to is not None:
+            episodes = [ep for ep in episodes if ep["id"] <= up_to]
+        return len(episodes)
+
+    def get_urls(self) -> List[str]:
+        return sorted(set(ep["url"] for ep in self._refresh()["episodic"] if ep["url"]))
+
+    def get_task_outcomes(self) -> List[Tuple[str, str, bool]]:
+        return [
+            (ep["task"], ep["url"], ep["success"]) for ep in self._refresh()["episodic"]
+        ]
+
+    def get_summary(self, kind: str, url: str) -> Optional[str]:
+        return self._refresh()[kind].get(url)
+
+    def summary_lock(self, url: str):
+        return self._summary_locks.hold(url)
+
+    @traced("store.set_summaries")
+    def set_summaries(self, url: str, summaries: Dict[str, str]):
+        with self._transaction() as memory:
+            for kind, summary in summaries.items():
+                memory[kind][url] = summary
+
+    def record_summary_update(self, **update: Any):
+        update["timestamp"] = datetime.now().isoformat()
+        with self._transaction() as memory:
+            memory.setdefault("summary_updates", []).append(update)
+
+    def get_summary_updates(self, url: Optional[str] = None) -> List[Dict]:
+        return [
+            update
+            for update in self._refresh().get("summary_updates", [])
+            if url is None or update["url"] == url
+        ]
+
+    def get_site_policy(self, host: str) -> Optional[Dict]:
+        return self._refresh().get("site_policies", {}).get(host)
+
+    def set_site_policy(self, host: str, policy: Dict[str, Any]):
+        with self._transaction() as memory:
+            memory.setdefault("site_policies", {})[host] = policy
+
+    def enqueue_job(self, owner: int, payload: Dict[str, Any]) -> int:
+        with self._transaction() as memory:
+            pending = memory.setdefault("pending_jobs", [])
+            job_id = max((job["id"] for job in pending), default=0) + 1
+            pending.append(
+                {
+                    "id": job_id,
+                    "owner": owner,
+                    "payload": payload,
+                    "attempts": 0,
+                    "claimed_at": datetime.now().isoformat(),
+                }
+            )
+            return job_id
+
+    def start_job(self, job_id: int) -> Optional[int]:
+        """Count a run of job `job_id` and return its attempts so far, or
+        None if the job is no longer pending."""
+        with self._transaction() as memory:
+            for job in memory.get("pending_jobs", []):
+                if job["id"] == job_id:
+                    job["attempts"] = job.get("attempts", 0) + 1
+                    job["claimed_at"] = datetime.now().isoformat()
+                    return job["attempts"]
+            return None
+
+    @staticmethod
+    def _remove_job(memory: Dict, job_id: int):
+        memory["pending_jobs"] = [
+            job for job in memory.get("pending_jobs", []) if job["id"] != job_id
+        ]
+
+    def complete_job(self, job_id: int):
+        with self._transaction() as memory:
+            self._remove_job(memory, job_id)
+
+    def get_job_owners(self) -> List[int]:
+        return sorted(
+            set(job["owner"] for job in self._refresh().get("pending_jobs", []))
+        )
+
+    def claim_jobs(self, from_owner: int, to_owner: int) -> List[Dict]:
+        return self._claim(to_owner, lambda job: job["owner"] == from_owner)
+
+    def claim_stale_jobs(self, to_owner: int, claimed_before: str) -> List[Dict]:
+        """Reassign other owners' jobs claimed before `claimed_before`."""
+        return self._claim(
+            to_owner,
+            lambda job: job["owner"] != to_owner
+            and job.get("claimed_at", "") < claimed_before,
+        )
+
+    def _claim(self, to_owner: int, match) -> List[Dict]:
+        now = datetime.now().isoformat()
+        with self._transaction() as memory:
+            claimed = []
+            for job in memory.get("pending_jobs", []):
+                if match(job):
+                    job["owner"] = to_owner
+                    job["claimed_at"] = now
+                    claimed.append({"id": job["id"], "payload": job["payload"]})
+            return claimed
+
+    def export(self) -> Dict:
+        return self._refresh()
+
+    def close(self):
+        pass
+
+
+class SqliteMemoryStore:
+    """Row-per-episode store; writes are appends inside a transaction, so their
+    cost doesn't depend on how much history has accumulated.
+
+    Safe to share between processes: write transactions take the database's
+    write lock up front (BEGIN IMMEDIATE) and wait up to `busy_timeout`
+    seconds for it, and readers always see the latest commit."""
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._summary_locks = SummaryLocks(path)
+        self._conn = sqlite3.connect(
+            path,
+            timeout=busy_timeout,
+            isolation_level="IMMEDIATE",
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns that an older database is missing. Callers open the
+        store under `open_memory_store`'s file lock, so only one process
+        migrates."""
+        with self._conn:
+            for (table, column), statements in MIGRATIONS.items():
+                columns = {
+                    row["name"]
+                    for row in self._conn.execute(f"PRAGMA table_info({table})")
+                }
+                if column not in columns:
+                    for statement in statements:
+                        self._conn.execute(statement)
+
+    def data_version(self) -> int:
+        """A number that changes when another connection commits a change."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _insert_episode(self, episode: Dict[str, Any]) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO episodes (task, success, url, timestamp, insights)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                episode["task"],
+                int(episode["success"]),
+                episode["url"],
+                episode.get("timestamp") or datetime.now().isoformat(),
+                json.dumps(episode["insights"]),
+            ),
+        )
+        self._conn.execute(
+            "INSERT INTO trajectories (episode_id, actions) VALUES (?, ?)",
+            (cursor.lastrowid, json.dumps(episode["trajectory"])),
+        )
+        return cursor.lastrowid
+
+    @traced("store.add_episode")
+    def add_episode(self, episode: Dict[str, Any], job_id: Optional[int] = None) -> int:
+        """Append an episode, completing the pending job `job_id` in the same transaction."""
+        with self._lock, self._conn:
+            episode_id = self._insert_episode(episode)
+            if job_id is not None:
+                self._conn.execute("DELETE FROM pending_jobs WHERE id = ?", (job_id,))
+            return episode_id
+
+    def get_episodes(
+        self,
+        url: Optional[str] = None,
+        limit: Optional[int] = None,
+        success: Optional[bool] = None,
+    ) -> List[Dict]:
+        query = (
+            "SELECT e.*, t.actions FROM episodes e"
+            " JOIN trajectories t ON t.episode_id = e.id"
+        )
+        clauses, params = [], []
+        if url is not None:
+            clauses.append("e.url = ?")
+            params.append(url)
+        if success is not None:
+            clauses.append("e.success = ?")
+            params.append(int(success))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY e.timestamp DESC, e.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_episode(row) for row in rows]
+
+    def get_episodes_by_id(self, ids: List[int]) -> List[Dict]:
+        """Fetch episodes by id, in the order given; unknown ids are skipped."""
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.*, t.actions FROM episodes e"
+                " JOIN trajectories t ON t.episode_id = e.id"
+                f" WHERE e.id IN ({','.join('?' * len(ids))})",
+                list(ids),
+            ).fetchall()
+        by_id = {row["id"]: self._row_to_episode(row) for row in rows}
+        return [by_id[i] for i in ids if i in by_id]
+
+    @staticmethod
+    def _row_to_episode(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "task": row["task"],
+            "success": bool(row["success"]),
+            "trajectory": json.loads(row["actions"]),
+            "url": row["url"],
+            "insights": json.loads(row["insights"]),
+            "timestamp": row["timestamp"],
+        }
+
+    def count_episodes(
+        self, url: Optional[str] = None, up_to: Optional[int] = None
+    ) -> int:
+        """Episodes (of `url`) with an id no greater than `up_to`, if given."""
+        query, params = "SELECT COUNT(*) FROM episodes WHERE 1", []
+        if url is not None:
+            query += " AND url = ?"
+            params.append(url)
+        if up_to is not None:
+            query += " AND id <= ?"
+            params.append(up_to)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return row[0]
+
+    def get_urls(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT url FROM episodes WHERE url != '' ORDER BY url"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_task_outcomes(self) -> List[Tuple[str, str, bool]]:
+        """(task, url, success) of every episode, without loading trajectories."""
+        with self._lock:
+            rows = self._conn.execute("SELECT task, url, success FROM episodes")
+            return [(task, url, bool(success)) for task, url, success in rows]
+
+    def get_summary(self, kind: str, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE url = ? AND kind = ?", (url, kind)
+            ).fetchone()
+        return row[0] if row else None
+
+    def summary_lock(self, url: str):
+        return self._summary_locks.hold(url)
+
+    @traced("store.set_summaries")
+    def set_summaries(self, url: str, summaries: Dict[str, str]):
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries (url, kind, summary, updated_at)"
+                " VALUES (?, ?, ?, ?)",
+                [(url, kind, summary, now) for kind, summary in summaries.items()],
+            )
+
+    def record_summary_update(
+        self,
+        url: str,
+        kind: str,
+        mode: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+    ):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO summary_updates"
+                " (url, kind, mode, prompt_tokens, completion_tokens, timestamp)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    kind,
+                    mode,
+                    prompt_tokens,
+                    completion_tokens,
+                    datetime.now().isoformat(),
+                ),
+            )
+
+    def get_summary_updates(self, url: Optional[str] = None) -> List[Dict]:
+        query = (
+            "SELECT url, kind, mode, prompt_tokens, completion_tokens, timestamp"
+            " FROM summary_updates"
+        )
+        params = []
+        if url is not None:
+            query += " WHERE url = ?"
+            params.append(url)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_site_policy(self, host: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT policy FROM site_policies WHERE host = ?", (host,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_site_policy(self, host: str, policy: Dict[str, Any]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO site_policies (host, policy, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (host) DO UPDATE SET"
+                " policy = excluded.policy, updated_at = excluded.updated_at",
+                (host, json.dumps(policy), datetime.now().isoformat()),
+            )
+
+    def enqueue_job(self, owner: int, payload: Dict[str, Any]) -> int:
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO pending_jobs (owner, payload, created_at, claimed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (owner, json.dumps(payload), now, now),
+            )
+            return cursor.lastrowid
+
+    def start_job(self, job_id: int) -> Optional[int]:
+        """Count a run of job `job_id` and return its attempts so far, or
+        None if the job is no longer pending."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "UPDATE pending_jobs SET attempts = attempts + 1, claimed_at = ?"
+                " WHERE id = ? RETURNING attempts",
+                (datetime.now().isoformat(), job_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def complete_job(self, job_id: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pending_jobs WHERE id = ?", (job_id,))
+
+    def get_job_owners(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT owner FROM pending_jobs ORDER BY owner"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim_jobs(self, from_owner: int, to_owner: int) -> List[Dict]:
+        """Reassign `from_owner`'s pending jobs to `to_owner` and return them."""
+        return self._claim(to_owner, "owner = ?", (from_owner,))
+
+    def claim_stale_jobs(self, to_owner: int, claimed_before: str) -> List[Dict]:
+        """Reassign other owners' jobs claimed before `claimed_before`."""
+        return self._claim(
+            to_owner, "owner != ? AND claimed_at < ?", (to_owner, claimed_before)
+        )
+
+    def _claim(self, to_owner: int, where: str, params: tuple) -> List[Dict]:
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "UPDATE pending_jobs SET owner = ?, claimed_at = ?"
+                f" WHERE {where} RETURNING id, payload",
+                (to_owner, datetime.now().isoformat(), *params),
+            ).fetchall()
+        rows = sorted(rows, key=lambda row: row["id"])
+        return [
+            {"id": row["id"], "payload": json.loads(row["payload"])} for row in rows
+        ]
+
+    def export(self) -> Dict:
+        memory = empty_memory()
+        memory["episodic"] = [
+            {key: value for key, value in ep.items() if key != "id"}
+            for ep in reversed(self.get_episodes())
+        ]
+        with self._lock:
+            rows = self._conn.execute("SELECT url, kind, summary FROM summaries")
+            for url, kind, summary in rows.fetchall():
+                memory[kind][url] = summary
+        return memory
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """Import a legacy memory.json in a single transaction. Returns the episode count."""
+        with open(json_path, "r") as f:
+            legacy = json.load(f)
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            for episode in legacy.get("episodic", []):
+                self._insert_episode(episode)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries (url, kind, summary, updated_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (url, kind, summary, now)
+                    for kind in SUMMARY_KINDS
+                    for url, summary in legacy.get(kind, {}).items()
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO site_policies (host, policy, updated_at)"
+                " VALUES (?, ?, ?)",
+                [
+                    (host, json.dumps(policy), now)
+                    for host, policy in legacy.get("site_policies", {}).items()
+                ],
+            )
+        return len(legacy.get("episodic", []))
+
+    def close(self):
+        self._conn.close()
+
+
+def open_memory_store(path: str, legacy_json: Optional[str] = None):
+    """Open the store for `path`, picking the backend from its extension.
+
+    A new SQLite store is seeded from `legacy_json` (default: `memory.json` next
+    to it) when that file exists, so existing memories carry over.
+    """
+    if path.endswith(".json"):
+        return JsonMemoryStore(path)
+
+    if legacy_json is None:
+        legacy_json = str(Path(path).with_name("memory.json"))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # Only the process that creates the database seeds it.
+    with file_lock(f"{path}.lock"):
+        is_new = not os.path.exists(path)
+        store = SqliteMemoryStore(path)
+        if is_new and os.path.exists(legacy_json):
+            store.migrate_from_json(legacy_json)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate memory.json to SQLite")
+    parser.add_argument("source", type=str, help="Path to the legacy memory.json")
+    parser.add_argument("destination", type=str, help="Path of the SQLite database")
+    args = parser.parse_args()
+    store = SqliteMemoryStore(args.destination)
+    count = store.migrate_from_json(args.source)
+    store.close()
+    print(f"Migrated {count} episodes from {args.source} to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from pydantic import BaseModel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+
+-- Running total of `size`, kept by the triggers below so eviction doesn't
+-- have to sum the table on every write. Seeded once for older caches.
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total)
+    SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE cache_size SET total = total + new.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE cache_size SET total = total + new.size - old.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE cache_size SET total = total - old.size WHERE id = 0;
+END;
+"""
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    invalid: int = 0  # cached structured outputs that no longer validate
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LLMCache:
+    """Content-addressed on-disk cache of LLM responses.
+
+    Entries are keyed on a hash of the request (model, messages and response
+    schema), expire after `ttl_seconds`, and the least recently used ones are
+    evicted once the cache holds more than `max_bytes` of content.
+    """
+
+    def __init__(
+        self,
+        path: str = ".data/llm_cache.db",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def key(request: dict[str, Any]) -> str:
+        """Hash a chat completion request (its model, messages and response_format)."""
+        canonical = json.dumps(
+            {
+                "model": request["model"],
+                "messages": request["messages"],
+                "response_format": request.get("response_format"),
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            content, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hits += 1
+        return content
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock, self._conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # wouldn't fire the size trigger.
+            self._conn.execute(
+                "INSERT INTO responses (key, content, size, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+                " content = excluded.content, size = excluded.size,"
+                " created_at = excluded.created_at, last_access = excluded.last_access",
+                (key, content, size, now, now),
+            )
+            self.stats.stores += 1
+            self._evict()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT total FROM cache_size").fetchone()[0]
+
+    def _evict(self):
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        # Read oldest first only as far as needed.
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        )
+        evicted = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats.evictions += len(evicted)
+
+    def invalidate(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats.invalid += 1
+            # The lookup that found the stale entry was counted as a hit.
+            self.stats.hits -= 1
+            self.stats.misses += 1
+
+    def close(self):
+        self._conn.close()
@@ -1,19 +1,147 @@
-from openai import OpenAI
+from functools import lru_cache
 from pydantic import BaseModel
 from typing import Any
 import os
 import dotenv
+import tiktoken
+
+from models.llm_cache import CacheStats, LLMCache
+from tracing import annotate, traced
 
 dotenv.load_dotenv()
 
 
 text_model = "openai/gpt-4.1-mini"
-client = OpenAI(
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1",
+_client = None
+
+
+def get_client():
+    """Create the OpenRouter client on first use (the openai import is slow)."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            base_url="https://openrouter.ai/api/v1",
+        )
+    return _client
+
+
+# Opt-in response cache; also enabled by setting LLM_CACHE_PATH.
+_cache: LLMCache | None = (
+    LLMCache(os.environ["LLM_CACHE_PATH"]) if os.getenv("LLM_CACHE_PATH") else None
 )
 
 
+def enable_llm_cache(
+    path: str = ".data/llm_cache.db",
+    ttl_seconds: float = 7 * 24 * 3600,
+    max_bytes: int = 256 * 1024 * 1024,
+) -> LLMCache:
+    """Serve repeated `llm_call`/`llm_call_messages` requests from an on-disk cache."""
+    global _cache
+    _cache = LLMCache(path, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+    return _cache
+
+
+def disable_llm_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def llm_cache_stats() -> CacheStats | None:
+    """Hit/miss counters of the active cache, or None when caching is off."""
+    return _cache.stats if _cache is not None else None
+
+
+def _complete(
+    kwargs: dict[str, Any], response_format: BaseModel | None = None
+) -> str | None:
+    """Run a chat completion, going through the response cache when it is enabled.
+
+    Cached structured outputs are re-validated against `response_format`; one
+    that no longer validates is dropped and fetched again.
+    """
+    cache = _cache
+    key = LLMCache.key(kwargs) if cache is not None else None
+    if key is not None:
+        content = cache.get(key)
+        if content is not None:
+            if response_format is None or _validates(response_format, content):
+                annotate(cached=True)
+                return content
+            cache.invalidate(key)
+
+    response = get_client().chat.completions.create(**kwargs)
+    if not response.choices or not response.choices[0].message.content:
+        return None
+    content = response.choices[0].message.content
+    if key is not None and (
+        response_format is None or _validates(response_format, content)
+    ):
+        cache.put(key, content)
+    return content
+
+
+def _validates(response_format: BaseModel, content: str) -> bool:
+    try:
+        response_format.model_validate_json(content)
+    except Exception:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> tiktoken.Encoding | None:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # The encoding is downloaded on first use; offline without a cached
+        # copy, fall back to an estimate rather than fail.
+        return None
+
+
+def count_tokens(text: str, model: str = text_model) -> int:
+    """Count the tokens `text` occupies for `model` (o200k_base if tiktoken doesn't know it)."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _call_attributes(
+    prompt: str,
+    system_prompt: str | None = None,
+    response_format: BaseModel | None = None,
+    model: str = text_model,
+) -> dict[str, Any]:
+    return {
+        "model": model,
+        "prompt_tokens": count_tokens((system_prompt or "") + prompt, model),
+        "structured": response_format is not None,
+    }
+
+
+def _messages_attributes(
+    messages: list[dict[str, str]],
+    response_format: BaseModel = None,
+    model: str = text_model,
+) -> dict[str, Any]:
+    text = "".join(str(message["content"]) for message in messages)
+    return {
+        "model": model,
+        "prompt_tokens": count_tokens(text, model),
+        "structured": response_format is not None,
+    }
+
+
+@traced("llm.call", _call_attributes)
 def llm_call(
     prompt: str,
     system_prompt: str | None = None,
@@ -85,24 +213,21 @@ def llm_call(
             },
         }
 
-        response = client.chat.completions.create(**kwargs)
+        content = _complete(kwargs, response_format)
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError(
-                "No valid response content received from the API", response
-            )
+        if not content:
+            raise ValueError("No valid response content received from the API")
 
         try:
-            return response_format.model_validate_json(
-                response.choices[0].message.content
-            )
+            return response_format.model_validate_json(content)
         except Exception as e:
-            print("Failed to parse response:", response.choices[0].message.content)
+            print("Failed to parse response:", content)
             raise ValueError(f"Failed to parse response: {e}")
 
-    return client.chat.completions.create(**kwargs).choices[0].message.content
+    return _complete(kwargs)
 
 
+@traced("llm.call_messages", _messages_attributes)
 def llm_call_messages(
     messages: list[dict[str, str]],
     response_format: BaseModel = None,
@@ -134,16 +259,14 @@ def llm_call_messages(
             },
         }
 
-        response = client.chat.completions.create(**kwargs)
+        content = _complete(kwargs, response_format)
         try:
-            return response_format.parse_raw(response.choices[0].message.content)
+            return response_format.parse_raw(content)
         except Exception as e:
-            print("Failed to parse response:", response)
+            print("Failed to parse response:", content)
             raise ValueError(f"Failed to parse response: {e}")
 
-    response = client.chat.completions.create(**kwargs)
-    try:
-        return response.choices[0].message.content
-    except Exception as e:
-        print("Failed to parse response:", response)
-        raise ValueError(f"Failed to parse response: {e}")
+    content = _complete(kwargs)
+    if content is None:
+        raise ValueError("No valid response content received from the API")
+    return content
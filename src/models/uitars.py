@@ -1,31 +1,293 @@
 # Use a pipeline as a high-level helper
+import json
 import os
+import threading
 import time
-from transformers import pipeline
+import urllib.error
+import urllib.request
+from collections import deque
 from rich.console import Console
 
+from tracing import traced
+
 console = Console()
 
-from ui_tars.action_parser import (
-    parse_action_to_structure_output,
-    parsing_response_to_pyautogui_code,
+MODEL_ID = "ByteDance-Seed/UI-TARS-1.5-7B"
+
+_pipe = None
+_pipe_lock = threading.Lock()
+# Held by every generation on the loaded model: Qwen2.5-VL keeps per-call
+# state (rope_deltas) on the model itself, so generations must not interleave.
+model_lock = threading.Lock()
+load_seconds: float | None = None  # how long the first load took
+# Selected with configure_backend() or UI_TARS_BACKEND; see models/uitars_backends.py.
+_backend = {"name": os.getenv("UI_TARS_BACKEND", "reference")}
+
+
+def configure_backend(name: str, num_threads: int | None = None, compile: bool = False):
+    """Pick how UI-TARS is loaded ("reference", "cpu-bf16" or "cpu-int8").
+    Must be called before the model is first used."""
+    global _backend
+    if _pipe is not None:
+        raise RuntimeError("UI-TARS is already loaded")
+    _backend = {"name": name, "num_threads": num_threads, "compile": compile}
+
+
+def get_pipeline():
+    """Load UI-TARS on first use. The 7B weights (and transformers/torch
+    themselves) are only imported here, so importing this module is cheap."""
+    global _pipe, load_seconds
+    if _pipe is None:
+        with _pipe_lock:
+            if _pipe is None:
+                from models.uitars_backends import BackendConfig, load_pipeline
+
+                start = time.perf_counter()
+                pipe = load_pipeline(MODEL_ID, BackendConfig(**_backend))
+                # Decoder-only models must be left-padded for batched
+                # generation; a single prompt has no padding, so set it once.
+                pipe.processor.tokenizer.padding_side = "left"
+                load_seconds = time.perf_counter() - start
+                console.print(
+                    f"[blue]Loaded {MODEL_ID} ({_backend['name']}) in {load_seconds:.1f}s[/blue]",
+                    style="dim",
+                )
+                _pipe = pipe
+    return _pipe
+
+
+class LatencyStats:
+    """Request counters plus latency percentiles over a sliding window."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.errors = 0
+        self._latencies_ms: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            if not error:
+                self._latencies_ms.append(latency_ms)
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            requests, errors = self.requests, self.errors
+
+        def percentile(p: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        return {
+            "requests": requests,
+            "errors": errors,
+            "mean_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+        }
+
+
+class UITarsClient:
+    """Client for a `uitars_server` daemon, so many agents can share one resident model.
+
+    `max_in_flight` caps this process's concurrent requests; the server queues
+    and limits requests across all of its clients.
+    """
+
+    def __init__(self, url: str, max_in_flight: int = 4, timeout: float = 600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.stats = LatencyStats()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def generate(
+        self, messages: list, max_new_tokens: int = 1000, session_id: str | None = None
+    ) -> str:
+        body = json.dumps(
+            {
+                "model": MODEL_ID,
+                "messages": messages,
+                "max_tokens": max_new_tokens,
+                "session_id": session_id,
+            }
+        ).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}/v1/chat/completions",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        with self._slots:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    payload = json.load(response)
+            except (urllib.error.URLError, TimeoutError):
+                self.stats.record((time.perf_counter() - start) * 1000, error=True)
+                raise
+            self.stats.record((time.perf_counter() - start) * 1000)
+        return payload["choices"][0]["message"]["content"]
+
+    def end_session(self, session_id: str):
+        request = urllib.request.Request(
+            f"{self.url}/v1/sessions/{session_id}", method="DELETE"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except urllib.error.URLError:
+            pass  # the server evicts idle sessions on its own
+
+    def health(self) -> dict:
+        with urllib.request.urlopen(f"{self.url}/health", timeout=10) as response:
+            return json.load(response)
+
+
+# Client mode is enabled by configure_client() or UI_TARS_SERVER_URL.
+_client: UITarsClient | None = (
+    UITarsClient(os.environ["UI_TARS_SERVER_URL"])
+    if os.getenv("UI_TARS_SERVER_URL")
+    else None
 )
-from ui_tars.prompt import COMPUTER_USE_DOUBAO
 
-from browser import Browser
 
-pipe = pipeline("image-text-to-text", model="ByteDance-Seed/UI-TARS-1.5-7B")
+def configure_client(url: str | None, max_in_flight: int = 4) -> UITarsClient | None:
+    """Send `ui_tars_call` requests to the server at `url` (None: run in-process)."""
+    global _client
+    _client = UITarsClient(url, max_in_flight=max_in_flight) if url else None
+    return _client
 
 
-def ui_tars_call(messages):
-    response = pipe(text=messages, max_new_tokens=1000)
-    response_text = response[-1]["generated_text"][-1]["content"]
-    original_image_width, original_image_height = 1920, 1080
+def local_generate_batch(conversations: list, max_new_tokens: int = 1000) -> list:
+    """Run several conversations through one padded `generate` call (the
+    tokenizer is left-padded when the model is loaded)."""
+    pipe = get_pipeline()
+    with model_lock:
+        outputs = pipe(
+            text=conversations,
+            max_new_tokens=max_new_tokens,
+            batch_size=len(conversations),
+        )
+    responses = []
+    for output in outputs:
+        if isinstance(output, list):
+            output = output[-1]
+        responses.append(output["generated_text"][-1]["content"])
+    return responses
+
+
+# Micro-batching is enabled by configure_batching(); off means batches of one.
+_batcher = None
+
+
+def configure_batching(max_batch_size: int | None, max_wait_ms: float = 20):
+    """Batch concurrent local `ui_tars_call`s (None or 1 turns batching off)."""
+    from models.uitars_batching import MicroBatcher
+
+    global _batcher
+    _batcher = (
+        MicroBatcher(local_generate_batch, max_batch_size, max_wait_ms)
+        if max_batch_size and max_batch_size > 1
+        else None
+    )
+    return _batcher
+
+
+# Prefix KV caching is enabled by configure_prefix_cache().
+_prefix_settings: dict | None = None
+_prefix_generator = None
+_prefix_lock = threading.Lock()
+
+
+def configure_prefix_cache(
+    enabled: bool = True, max_sessions: int = 4, max_tokens: int = 65536
+):
+    """Reuse each session's conversation-prefix KV cache across `ui_tars_call`s."""
+    global _prefix_settings, _prefix_generator
+    _prefix_settings = (
+        {"max_sessions": max_sessions, "max_tokens": max_tokens} if enabled else None
+    )
+    _prefix_generator = None
+
+
+def get_prefix_generator():
+    """The in-process prefix-caching generator, or None when prefix caching is
+    off or inference goes to a server (which keeps its own caches)."""
+    global _prefix_generator
+    if _prefix_settings is None or _client is not None:
+        return None
+    if _prefix_generator is None:
+        from models.uitars_prefix import PrefixCachedGenerator
+
+        with _prefix_lock:
+            if _prefix_generator is None:
+                _prefix_generator = PrefixCachedGenerator(
+                    get_pipeline(), model_lock=model_lock, **_prefix_settings
+                )
+    return _prefix_generator
+
+
+def end_session(session_id: str):
+    """Free whatever inference state is held for an agent session."""
+    if _client is not None:
+        _client.end_session(session_id)
+    elif _prefix_generator is not None:
+        _prefix_generator.end_session(session_id)
+
+
+def local_generate(
+    messages: list, max_new_tokens: int = 1000, session_id: str | None = None
+) -> str:
+    """Run UI-TARS in this process and return the raw response text."""
+    prefix_generator = get_prefix_generator() if session_id else None
+    if prefix_generator is not None:
+        try:
+            return prefix_generator.generate(session_id, messages, max_new_tokens)
+        except Exception as e:
+            # Prefix reuse depends on model internals; never let it fail a step.
+            console.print(f"[yellow]Prefix cache disabled for step:[/yellow] {e}")
+            prefix_generator.end_session(session_id)
+    if _batcher is not None:
+        return _batcher.submit(messages, max_new_tokens)
+    pipe = get_pipeline()
+    with model_lock:
+        response = pipe(text=messages, max_new_tokens=max_new_tokens)
+    return response[-1]["generated_text"][-1]["content"]
+
+
+def _call_attributes(messages, session_id: str | None = None) -> dict:
+    images = [
+        part["url"]
+        for message in messages
+        for part in message["content"]
+        if part.get("type") == "image"
+    ]
+    return {
+        "backend": "server" if _client is not None else _backend["name"],
+        "messages": len(messages),
+        "images": len(images),
+        # Decoded size of the base64 data URLs.
+        "image_bytes": sum(len(url) - url.find(",") - 1 for url in images) * 3 // 4,
+    }
+
+
+@traced("ui_tars.call", _call_attributes)
+def ui_tars_call(messages, session_id: str | None = None):
+    if _client is not None:
+        response_text = _client.generate(messages, session_id=session_id)
+    else:
+        response_text = local_generate(messages, session_id=session_id)
     action = response_text.split("Action: ")[1]
     return action, response_text
 
 
 def main():
+    from ui_tars.prompt import COMPUTER_USE_DOUBAO
+
+    from browser import Browser
+
     base_path = "../.data/screenshots"
     os.makedirs(base_path, exist_ok=True)
 
@@ -44,14 +306,14 @@ def main():
         },
     ]
 
-    browser = Browser()
+    browser = Browser(archive_dir=base_path)
     browser.goto_url("https://www.google.com")
-    image = browser.take_screenshot(f"{base_path}/screenshot{time.time()}.png")
+    state = browser.get_state()
     messages += [
         {
             "role": "user",
             "content": [
-                {"type": "image", "url": f"data:image/png;base64,{image}"},
+                {"type": "image", "url": state.page_screenshot_base64},
             ],
         }
     ]
@@ -0,0 +1,257 @@
+import argparse
+import base64
+import multiprocessing
+import queue
+import re
+import resource
+import time
+from pathlib import Path
+from typing import Dict, List
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+BACKENDS = ("reference", "cpu-bf16", "cpu-int8")
+
+
+class BackendConfig(BaseModel):
+    name: str = "reference"
+    num_threads: int | None = None  # torch intra-op threads; None keeps torch's default
+    compile: bool = False  # wrap the model's forward in torch.compile
+
+
+def load_pipeline(model_id: str, config: BackendConfig):
+    """Build the UI-TARS pipeline for the selected backend.
+
+    - reference: transformers' defaults (full precision).
+    - cpu-bf16: bfloat16 weights on CPU; half the memory of fp32.
+    - cpu-int8: dynamic int8 quantization of every `nn.Linear` on CPU.
+    """
+    import torch
+    from transformers import AutoModelForImageTextToText, AutoProcessor, pipeline
+
+    if config.name not in BACKENDS:
+        raise ValueError(f"Unknown UI-TARS backend: {config.name}")
+    if config.num_threads:
+        torch.set_num_threads(config.num_threads)
+
+    if config.name == "reference":
+        pipe = pipeline("image-text-to-text", model=model_id)
+    else:
+        dtype = torch.bfloat16 if config.name == "cpu-bf16" else torch.float32
+        model = AutoModelForImageTextToText.from_pretrained(
+            model_id, torch_dtype=dtype, low_cpu_mem_usage=True
+        ).eval()
+        if config.name == "cpu-int8":
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        pipe = pipeline(
+            "image-text-to-text",
+            model=model,
+            processor=AutoProcessor.from_pretrained(model_id),
+            device="cpu",
+        )
+
+    if config.compile:
+        pipe.model.forward = torch.compile(pipe.model.forward, dynamic=True)
+    return pipe
+
+
+def normalize_action(response_text: str) -> Dict:
+    """Reduce a UI-TARS response to its action name, coordinates and string args."""
+    action = response_text.split("Action: ")[-1].strip()
+    match = re.match(r"(\w+)\((.*)\)", action, re.S)
+    if not match:
+        return {"name": action, "coords": [], "text": []}
+    name, args = match.groups()
+    strings = re.findall(r"(\w+)='([^']*)'", args)
+    coords = [int(n) for _, value in strings for n in re.findall(r"-?\d+", value)]
+    text = [
+        value for key, value in strings if key in ("content", "key", "direction")
+    ]
+    return {"name": name, "coords": coords, "text": text}
+
+
+def actions_agree(reference: Dict, candidate: Dict, tolerance: int) -> bool:
+    if reference["name"] != candidate["name"] or reference["text"] != candidate["text"]:
+        return False
+    if len(reference["coords"]) != len(candidate["coords"]):
+        return False
+    return all(
+        abs(a - b) <= tolerance
+        for a, b in zip(reference["coords"], candidate["coords"])
+    )
+
+
+def _screenshot_messages(path: Path) -> list:
+    from models.prompts import common_browser_system_prompt
+
+    encoded = base64.b64encode(path.read_bytes()).decode("utf-8")
+    return [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": common_browser_system_prompt.format(
+                        language="English",
+                        instruction="Complete the task shown on this page",
+                    ),
+                }
+            ],
+        },
+        {
+            "role": "user",
+            "content": [{"type": "image", "url": f"data:image/png;base64,{encoded}"}],
+        },
+    ]
+
+
+def _run_backend(
+    config: BackendConfig, screenshots: List[str], max_new_tokens: int, results
+):
+    """Child process: load one backend and run every screenshot greedily."""
+    from models.uitars import MODEL_ID
+
+    start = time.perf_counter()
+    pipe = load_pipeline(MODEL_ID, config)
+    load_seconds = time.perf_counter() - start
+
+    responses, latencies = [], []
+    for screenshot in screenshots:
+        start = time.perf_counter()
+        output = pipe(
+            text=_screenshot_messages(Path(screenshot)),
+            max_new_tokens=max_new_tokens,
+            generate_kwargs={"do_sample": False},
+        )
+        latencies.append(time.perf_counter() - start)
+        responses.append(output[-1]["generated_text"][-1]["content"])
+
+    results.put(
+        {
+            "load_seconds": load_seconds,
+            "responses": responses,
+            "latencies": latencies,
+            # ru_maxrss is in KiB on Linux.
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+    )
+
+
+def _wait_for_result(process, results, poll_seconds: float = 5.0) -> Dict | None:
+    """The child's result, or None once it has exited without sending one."""
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            if not process.is_alive():
+                # It may have sent its result just before exiting.
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    return None
+
+
+def compare_backends(
+    screenshots: List[str],
+    configs: List[BackendConfig],
+    max_new_tokens: int = 256,
+    tolerance: int = 14,
+) -> Dict[str, Dict]:
+    """Run each backend in a fresh process (so peak memory is its own) and check
+    its parsed actions against the first backend's. A backend whose process
+    dies (e.g. killed for running out of memory) is reported as failed, and
+    the first one that completed becomes the reference."""
+    if not screenshots:
+        raise ValueError("No screenshots to compare backends on")
+    if not configs:
+        raise ValueError("No backends to compare")
+    context = multiprocessing.get_context("spawn")
+    runs, report = {}, {}
+    for config in configs:
+        results = context.Queue()
+        process = context.Process(
+            target=_run_backend, args=(config, screenshots, max_new_tokens, results)
+        )
+        process.start()
+        run = _wait_for_result(process, results)
+        process.join()
+        if run is None:
+            report[config.name] = {
+                "failed": f"backend process exited with code {process.exitcode}"
+            }
+        else:
+            runs[config.name] = run
+    if not runs:
+        return report
+
+    reference = [normalize_action(r) for r in next(iter(runs.values()))["responses"]]
+    for name, run in runs.items():
+        actions = [normalize_action(r) for r in run["responses"]]
+        agreed = sum(
+            actions_agree(ref, action, tolerance)
+            for ref, action in zip(reference, actions)
+        )
+        report[name] = {
+            "load_seconds": round(run["load_seconds"], 1),
+            "mean_latency_s": round(sum(run["latencies"]) / len(run["latencies"]), 2),
+            "peak_rss_mb": round(run["peak_rss_mb"]),
+            "agreement": agreed / len(actions),
+            "mismatches": [
+                {"screenshot": screenshot, "reference": ref, "candidate": action}
+                for screenshot, ref, action in zip(screenshots, reference, actions)
+                if not actions_agree(ref, action, tolerance)
+            ],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check UI-TARS backends for action parity and compare their cost"
+    )
+    parser.add_argument("--screenshots", type=str, required=True, help="Directory of PNGs")
+    parser.add_argument("--backends", type=str, default="reference,cpu-bf16,cpu-int8")
+    parser.add_argument("--num-threads", type=int, default=None)
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--tolerance", type=int, default=14, help="Pixels")
+    args = parser.parse_args()
+
+    screenshots = sorted(str(p) for p in Path(args.screenshots).glob("*.png"))
+    if not screenshots:
+        parser.error(f"no .png screenshots in {args.screenshots}")
+    configs = [
+        BackendConfig(name=name, num_threads=args.num_threads, compile=args.compile)
+        for name in args.backends.split(",")
+    ]
+    report = compare_backends(
+        screenshots, configs, args.max_new_tokens, args.tolerance
+    )
+
+    table = Table("backend", "load s", "mean latency s", "peak RSS MB", "action parity")
+    for name, row in report.items():
+        if "failed" in row:
+            table.add_row(name, "-", "-", "-", f"[red]failed: {row['failed']}[/red]")
+            continue
+        table.add_row(
+            name,
+            str(row["load_seconds"]),
+            str(row["mean_latency_s"]),
+            str(row["peak_rss_mb"]),
+            f"{row['agreement']:.0%}",
+        )
+    console.print(table)
+    for name, row in report.items():
+        for mismatch in row.get("mismatches", []):
+            console.print(f"[red]{name} disagrees on {mismatch['screenshot']}:[/red]")
+            console.print(f"  reference: {mismatch['reference']}")
+            console.print(f"  {name}: {mismatch['candidate']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+
+class _Request:
+    def __init__(self, messages: list, max_new_tokens: int):
+        self.messages = messages
+        self.max_new_tokens = max_new_tokens
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result: str | None = None
+        self.error: Exception | None = None
+
+
+class BatchSizeStats:
+    def __init__(self):
+        self.batches = 0
+        self.requests = 0
+        self.batch_seconds = 0.0
+        self.latency_seconds = 0.0  # enqueue -> result, summed over requests
+
+    def summary(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_ms": round(self.batch_seconds / self.batches * 1000, 1),
+            "mean_latency_ms": round(self.latency_seconds / self.requests * 1000, 1),
+            "throughput_rps": round(self.requests / self.batch_seconds, 3)
+            if self.batch_seconds
+            else None,
+        }
+
+
+class MicroBatcher:
+    """Collects requests that arrive within `max_wait_ms` of each other (up to
+    `max_batch_size`) and runs them through `generate_batch` in one call.
+
+    `generate_batch(conversations, max_new_tokens)` must return one response
+    text per conversation, in order; each is handed back to its caller.
+    """
+
+    def __init__(
+        self,
+        generate_batch: Callable[[List[list], int], List[str]],
+        max_batch_size: int = 4,
+        max_wait_ms: float = 20,
+    ):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.stats: Dict[int, BatchSizeStats] = {}
+        self._pending: List[_Request] = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="uitars-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, messages: list, max_new_tokens: int = 1000) -> str:
+        """Queue one conversation and block until its response is ready."""
+        request = _Request(messages, max_new_tokens)
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0].enqueued_at + self.max_wait_ms / 1000
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start = time.perf_counter()
+            try:
+                results = self.generate_batch(
+                    [request.messages for request in batch],
+                    max(request.max_new_tokens for request in batch),
+                )
+                if len(results) != len(batch):
+                    raise ValueError(
+                        f"generate_batch returned {len(results)} results"
+                        f" for {len(batch)} requests"
+                    )
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            end = time.perf_counter()
+
+            stats = self.stats.setdefault(len(batch), BatchSizeStats())
+            stats.batches += 1
+            stats.requests += len(batch)
+            stats.batch_seconds += end - start
+            for request in batch:
+                stats.latency_seconds += end - request.enqueued_at
+                request.done.set()
+
+    def report(self) -> Dict[int, dict]:
+        """Throughput and latency per observed batch size."""
+        return {size: self.stats[size].summary() for size in sorted(self.stats)}
+
+
+def main():
+    from models.prompts import common_browser_system_prompt
+    from models.uitars import local_generate_batch
+
+    parser = argparse.ArgumentParser(
+        description="Measure UI-TARS throughput and latency per batch size"
+    )
+    parser.add_argument("--screenshot", type=str, required=True)
+    parser.add_argument("--batch-sizes", type=str, default="1,2,4")
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    with open(args.screenshot, "rb") as f:
+        image_url = f"data:image/png;base64,{base64.b64encode(f.read()).decode()}"
+    messages = [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": common_browser_system_prompt.format(
+                        language="English", instruction="Search for candy online"
+                    ),
+                }
+            ],
+        },
+        {"role": "user", "content": [{"type": "image", "url": image_url}]},
+    ]
+
+    table = Table("batch size", "requests", "mean batch ms", "mean latency ms", "req/s")
+    for size in [int(size) for size in args.batch_sizes.split(",")]:
+        batcher = MicroBatcher(local_generate_batch, size, args.max_wait_ms)
+        with ThreadPoolExecutor(max_workers=size) as pool:
+            for _ in pool.map(
+                lambda _: batcher.submit(messages, args.max_new_tokens),
+                range(size * 2),
+            ):
+                pass
+        for batch_size, summary in batcher.report().items():
+            table.add_row(
+                str(batch_size),
+                str(summary["requests"]),
+                str(summary["mean_batch_ms"]),
+                str(summary["mean_latency_ms"]),
+                str(summary["throughput_rps"]),
+            )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+from pydantic import BaseModel
+
+
+class PrefixStepStats(BaseModel):
+    session_id: str
+    prompt_tokens: int
+    reused_tokens: int
+    ttft_ms: float  # request start -> first generated token's logits
+    total_ms: float
+
+
+class _Entry:
+    def __init__(self, ids, cache):
+        self.ids = ids  # 1-D tensor of the cached prefix's token ids
+        self.cache = cache
+
+
+def _common_prefix_length(a, b) -> int:
+    n = min(a.shape[0], b.shape[0])
+    if n == 0:
+        return 0
+    mismatch = (a[:n] != b[:n]).nonzero()
+    return int(mismatch[0]) if mismatch.numel() else n
+
+
+class PrefixCachedGenerator:
+    """Reuses the past-key-values of each agent session's stable prefix.
+
+    Between steps an agent's conversation only grows: the system prompt, plan
+    and earlier turns stay the same and a new screenshot is appended. The KV
+    cache of everything before the first image is kept per session, so each
+    step only encodes the new turn and screenshot. Images are never cached,
+    because the agent strips old screenshots from its history.
+
+    Sessions are evicted least-recently-used once there are more than
+    `max_sessions` or they hold more than `max_tokens` cached tokens, and
+    dropped explicitly with `end_session`.
+
+    The prefill is driven by hand because Qwen2.5-VL's `generate` drops
+    `pixel_values` when a prefilled cache is passed in. The prompt minus its
+    last token is run through the model, with multimodal rope positions
+    computed for the full prompt, and `generate` then decodes from the
+    filled cache.
+    """
+
+    def __init__(
+        self,
+        pipe,
+        max_sessions: int = 4,
+        max_tokens: int = 65536,
+        model_lock: threading.Lock | None = None,
+    ):
+        self.model = pipe.model
+        self.processor = pipe.processor
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.step_stats: deque = deque(maxlen=1000)
+        self._sessions: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        # rope_deltas live on the model, so generations must not interleave;
+        # pass the lock that the model's other callers hold (`uitars.model_lock`).
+        self._model_lock = model_lock or threading.Lock()
+        self._image_token_id = self.model.config.image_token_id
+
+    def end_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _store(self, session_id: str, entry: _Entry):
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions or (
+                len(self._sessions) > 1
+                and sum(e.ids.shape[0] for e in self._sessions.values())
+                > self.max_tokens
+            ):
+                self._sessions.popitem(last=False)
+
+    def _set_rope_deltas(self, rope_deltas):
+        for module in (self.model, getattr(self.model, "model", None)):
+            if module is not None and hasattr(module, "rope_deltas"):
+                module.rope_deltas = rope_deltas
+
+    def generate(self, session_id: str, messages: list, max_new_tokens: int) -> str:
+        """Generate a response for `messages`, reusing `session_id`'s cached prefix."""
+        with self._model_lock:
+            return self._generate(session_id, messages, max_new_tokens)
+
+    def _generate(self, session_id: str, messages: list, max_new_tokens: int) -> str:
+        import torch
+        from transformers import DynamicCache, LogitsProcessor, LogitsProcessorList
+
+        start = time.perf_counter()
+        first_token_at = []
+
+        class FirstToken(LogitsProcessor):
+            def __call__(self, input_ids, scores):
+                if not first_token_at:
+                    first_token_at.append(time.perf_counter())
+                return scores
+
+        inputs = self.processor.apply_chat_template(
+            messages,
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+        ).to(self.model.device)
+        input_ids = inputs["input_ids"]
+        attention_mask = inputs["attention_mask"]
+        n = input_ids.shape[1]
+
+        image_positions = (input_ids[0] == self._image_token_id).nonzero()
+        # Everything before the first image token is stable across steps.
+        stable = int(image_positions[0]) if image_positions.numel() else n - 1
+        stable = min(stable, n - 1)
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        reused = 0
+        if entry is not None:
+            reused = min(_common_prefix_length(entry.ids, input_ids[0]), stable)
+        if reused:
+            past = copy.deepcopy(entry.cache)
+            past.crop(reused)
+        else:
+            past = DynamicCache()
+
+        with torch.no_grad():
+            position_ids, rope_deltas = self.model.model.get_rope_index(
+                input_ids,
+                inputs.get("image_grid_thw"),
+                None,
+                attention_mask=attention_mask,
+            )
+            if reused < n - 1:
+                self.model(
+                    input_ids=input_ids[:, reused : n - 1],
+                    attention_mask=attention_mask[:, : n - 1],
+                    pixel_values=inputs.get("pixel_values"),
+                    image_grid_thw=inputs.get("image_grid_thw"),
+                    position_ids=position_ids[:, :, reused : n - 1],
+                    past_key_values=past,
+                    cache_position=torch.arange(reused, n - 1, device=input_ids.device),
+                    use_cache=True,
+                )
+
+            snapshot = copy.deepcopy(past)
+            snapshot.crop(stable)
+            self._store(session_id, _Entry(input_ids[0, :stable].clone(), snapshot))
+
+            self._set_rope_deltas(rope_deltas)
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past,
+                max_new_tokens=max_new_tokens,
+                logits_processor=LogitsProcessorList([FirstToken()]),
+            )
+
+        response_text = self.processor.batch_decode(
+            output[:, n:], skip_special_tokens=True
+        )[0]
+        end = time.perf_counter()
+        self.step_stats.append(
+            PrefixStepStats(
+                session_id=session_id,
+                prompt_tokens=n,
+                reused_tokens=reused,
+                ttft_ms=round(((first_token_at or [end])[0] - start) * 1000, 1),
+                total_ms=round((end - start) * 1000, 1),
+            )
+        )
+        return response_text
@@ -0,0 +1,217 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rich.console import Console
+
+import models.uitars as uitars
+from models.uitars import MODEL_ID, LatencyStats, get_pipeline, local_generate
+
+console = Console()
+
+
+class InferenceQueue:
+    """Admits at most `max_concurrency` generations at a time and lets up to
+    `max_queue` more wait; anything beyond that is rejected."""
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 16):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.stats = LatencyStats()
+        self.queued = 0
+        self.active = 0
+        self.rejected = 0
+        self._slots = threading.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+    def run(
+        self, messages: list, max_new_tokens: int, session_id: str | None = None
+    ) -> str | None:
+        """Generate a response, or return None if the queue is full."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                return None
+            self.queued += 1
+        start = time.perf_counter()
+        with self._slots:
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                response_text = local_generate(messages, max_new_tokens, session_id)
+            except Exception:
+                self.stats.record((time.perf_counter() - start) * 1000, error=True)
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+        self.stats.record((time.perf_counter() - start) * 1000)
+        return response_text
+
+    def health(self) -> dict:
+        with self._lock:
+            state = {"queued": self.queued, "active": self.active}
+        health = {
+            "status": "ok",
+            "model": MODEL_ID,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            **state,
+            **self.stats.summary(),
+        }
+        if uitars._batcher is not None:
+            health["batching"] = uitars._batcher.report()
+        return health
+
+
+def make_handler(queue: InferenceQueue):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, queue.health())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/v1/chat/completions":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+                messages = request["messages"]
+            except (ValueError, KeyError):
+                self._send(400, {"error": "expected a JSON body with messages"})
+                return
+
+            try:
+                response_text = queue.run(
+                    messages, request.get("max_tokens", 1000), request.get("session_id")
+                )
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            if response_text is None:
+                self._send(503, {"error": "inference queue is full"})
+                return
+
+            self._send(
+                200,
+                {
+                    "object": "chat.completion",
+                    "model": MODEL_ID,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": response_text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                },
+            )
+
+        def do_DELETE(self):
+            prefix = "/v1/sessions/"
+            if not self.path.startswith(prefix):
+                self._send(404, {"error": "not found"})
+                return
+            uitars.end_session(self.path[len(prefix) :])
+            self._send(200, {"status": "ended"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8008,
+    max_concurrency: int = 1,
+    max_queue: int = 16,
+    max_batch_size: int = 1,
+    max_wait_ms: float = 20,
+    prefix_cache: bool = False,
+    backend: str | None = None,
+    num_threads: int | None = None,
+):
+    """Load UI-TARS once and serve an OpenAI-compatible chat completions endpoint.
+
+    Generations on the model run one at a time (see `uitars.model_lock`);
+    `max_concurrency` only sets how many requests are admitted past the
+    queue. With `max_batch_size` > 1, concurrent requests are micro-batched,
+    so at least that many are admitted to the batcher at a time and a batch
+    is the unit that runs.
+    """
+    if backend:
+        uitars.configure_backend(backend, num_threads=num_threads)
+    get_pipeline()
+    if prefix_cache:
+        uitars.configure_prefix_cache()
+    if max_batch_size > 1:
+        uitars.configure_batching(max_batch_size, max_wait_ms)
+        max_concurrency = max(max_concurrency, max_batch_size)
+    queue = InferenceQueue(max_concurrency=max_concurrency, max_queue=max_queue)
+    server = ThreadingHTTPServer((host, port), make_handler(queue))
+    console.print(f"[green]Serving {MODEL_ID} on http://{host}:{port}[/green]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared UI-TARS inference server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=1,
+        help="Requests admitted at once; the model still runs one generation"
+        " (or one --max-batch-size batch) at a time",
+    )
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--max-batch-size", type=int, default=1)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="Keep per-session prefix KV caches for requests that carry a session_id",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=None,
+        choices=["reference", "cpu-bf16", "cpu-int8"],
+    )
+    parser.add_argument("--num-threads", type=int, default=None)
+    args = parser.parse_args()
+    serve(
+        args.host,
+        args.port,
+        args.max_concurrency,
+        args.max_queue,
+        args.max_batch_size,
+        args.max_wait_ms,
+        args.prefix_cache,
+        args.backend,
+        args.num_threads,
+    )
+
+
+if __name__ == "__main__":
+    main()
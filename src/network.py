@@ -0,0 +1,216 @@
+import argparse
+import fnmatch
+import threading
+from collections import Counter
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+from pydantic import BaseModel, Field
+from rich.console import Console
+
+console = Console()
+
+# Playwright resource types that rarely matter to an agent reading screenshots.
+DEFAULT_BLOCKED_TYPES = ["media", "font"]
+
+DEFAULT_BLOCKED_HOSTS = [
+    "*.doubleclick.net",
+    "*.googlesyndication.com",
+    "*.google-analytics.com",
+    "*.googletagmanager.com",
+    "*.googleadservices.com",
+    "*.facebook.net",
+    "*.hotjar.com",
+    "*.segment.io",
+    "*.segment.com",
+    "*.mixpanel.com",
+    "*.scorecardresearch.com",
+    "*.criteo.com",
+    "*.taboola.com",
+    "*.outbrain.com",
+    "*.adnxs.com",
+    "*.amazon-adsystem.com",
+    "*.newrelic.com",
+    "*.nr-data.net",
+    "*.clarity.ms",
+]
+
+# Typical transfer sizes, used until responses of the type have been seen.
+DEFAULT_SIZE_BYTES = {
+    "document": 60_000,
+    "stylesheet": 20_000,
+    "image": 40_000,
+    "media": 500_000,
+    "font": 40_000,
+    "script": 30_000,
+    "xhr": 3_000,
+    "fetch": 3_000,
+}
+FALLBACK_SIZE_BYTES = 5_000
+
+
+class BlockPolicy(BaseModel):
+    """What to block: requests of `resource_types`, or to hosts matching one of
+    the fnmatch `host_patterns`, unless the host matches `allow_hosts`.
+    Documents are never blocked."""
+
+    resource_types: List[str] = Field(default_factory=lambda: [*DEFAULT_BLOCKED_TYPES])
+    host_patterns: List[str] = Field(default_factory=lambda: [*DEFAULT_BLOCKED_HOSTS])
+    allow_hosts: List[str] = Field(default_factory=list)
+
+    def block_reason(self, resource_type: str, host: str) -> str | None:
+        if resource_type == "document":
+            return None
+        if any(_host_matches(host, pattern) for pattern in self.allow_hosts):
+            return None
+        if resource_type in self.resource_types:
+            return resource_type
+        if any(_host_matches(host, pattern) for pattern in self.host_patterns):
+            return "host"
+        return None
+
+
+def _host_matches(host: str, pattern: str) -> bool:
+    # "*.example.com" also covers the bare "example.com".
+    return fnmatch.fnmatch(host, pattern) or (
+        pattern.startswith("*.") and host == pattern[2:]
+    )
+
+
+class NavigationReport(BaseModel):
+    url: str
+    load_ms: float
+    requests_allowed: int
+    requests_blocked: int
+    blocked_by: Dict[str, int]  # reason (resource type or "host") -> requests
+    bytes_allowed: int  # from Content-Length, where responses declare it
+    bytes_blocked_estimate: int
+    saved_ms_estimate: float
+
+
+class RequestBlocker:
+    """Blocks requests in a browser context according to a `BlockPolicy`.
+
+    Routes every request of the context. Blocked requests are aborted; the
+    rest are passed on with `route.fallback()`, so other route handlers (such
+    as a recorder) still see them.
+
+    The policy is chosen per navigation: `policy_source(host)` may return a
+    site-specific policy (e.g. one stored in memory), otherwise `policy`
+    applies. Blocked bytes are estimated from the mean size of allowed
+    responses of the same type, and load time saved from the blocked share of
+    the navigation's bytes.
+    """
+
+    def __init__(
+        self,
+        context,
+        policy: BlockPolicy | None = None,
+        policy_source: Callable[[str], BlockPolicy | None] | None = None,
+    ):
+        self.default_policy = policy or BlockPolicy()
+        self.policy_source = policy_source
+        self.policy = self.default_policy
+        self.reports: List[NavigationReport] = []
+        self._lock = threading.Lock()
+        self._size_totals: Dict[str, List[int]] = {}  # type -> [bytes, responses]
+        self._reset()
+        context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def _reset(self):
+        self._allowed = 0
+        self._blocked: Counter = Counter()
+        self._bytes_allowed = 0
+        self._bytes_blocked = 0
+
+    def _size_estimate(self, resource_type: str) -> int:
+        total, count = self._size_totals.get(resource_type, (0, 0))
+        if count:
+            return total // count
+        return DEFAULT_SIZE_BYTES.get(resource_type, FALLBACK_SIZE_BYTES)
+
+    def _handle(self, route, request):
+        host = urlparse(request.url).hostname or ""
+        reason = self.policy.block_reason(request.resource_type, host)
+        if reason is None:
+            with self._lock:
+                self._allowed += 1
+            route.fallback()
+            return
+        with self._lock:
+            self._blocked[reason] += 1
+            self._bytes_blocked += self._size_estimate(request.resource_type)
+        route.abort("blockedbyclient")
+
+    def _on_response(self, response):
+        length = response.headers.get("content-length")
+        if not length or not length.isdigit():
+            return
+        resource_type = response.request.resource_type
+        with self._lock:
+            totals = self._size_totals.setdefault(resource_type, [0, 0])
+            totals[0] += int(length)
+            totals[1] += 1
+            self._bytes_allowed += int(length)
+
+    def start_navigation(self, url: str):
+        """Pick the policy for `url`'s site and reset the per-navigation counters."""
+        host = urlparse(url).hostname or ""
+        site_policy = self.policy_source(host) if self.policy_source else None
+        with self._lock:
+            self.policy = site_policy or self.default_policy
+            self._reset()
+
+    def finish_navigation(self, url: str, load_ms: float) -> NavigationReport:
+        with self._lock:
+            allowed, blocked = self._bytes_allowed, self._bytes_blocked
+            report = NavigationReport(
+                url=url,
+                load_ms=round(load_ms, 1),
+                requests_allowed=self._allowed,
+                requests_blocked=sum(self._blocked.values()),
+                blocked_by=dict(self._blocked),
+                bytes_allowed=allowed,
+                bytes_blocked_estimate=blocked,
+                # Assumes load time scales with the bytes transferred.
+                saved_ms_estimate=(
+                    round(load_ms * blocked / allowed, 1) if allowed else 0.0
+                ),
+            )
+        self.reports.append(report)
+        return report
+
+
+def main():
+    from memory import Memory
+
+    parser = argparse.ArgumentParser(
+        description="Show or set a site's network blocking policy in memory"
+    )
+    parser.add_argument("host", type=str, help="e.g. www.example.com")
+    parser.add_argument("--memory", type=str, default=".data/memory.db")
+    parser.add_argument("--block-types", type=str, help="Comma-separated types")
+    parser.add_argument("--block-hosts", type=str, help="Comma-separated patterns")
+    parser.add_argument("--allow-hosts", type=str, help="Comma-separated patterns")
+    args = parser.parse_args()
+
+    memory = Memory(args.memory)
+    policy = BlockPolicy(**(memory.get_site_policy(args.host) or {}))
+    updates = {
+        field: value.split(",") if value else []
+        for field, value in (
+            ("resource_types", args.block_types),
+            ("host_patterns", args.block_hosts),
+            ("allow_hosts", args.allow_hosts),
+        )
+        if value is not None
+    }
+    if updates:
+        policy = policy.copy(update=updates)
+        memory.set_site_policy(args.host, policy.dict())
+    console.print_json(data=policy.dict())
+    memory.store.close()
+
+
+if __name__ == "__main__":
+    main()
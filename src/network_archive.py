@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+MODES = ("record", "replay", "offline")
+
+# Query parameters that can only be cache-busters (plus any "cachebust*").
+# Names like `v` or `t` are left alone: they often select the content.
+VOLATILE_PARAMS = {"_", "_t", "_ts", "cb", "nocache"}
+# Playwright resource types that may be served a recording of the same URL
+# without its cache-busters. Documents never are: a near miss there would
+# silently show the wrong page.
+FUZZY_RESOURCE_TYPES = {"script", "stylesheet", "image", "font", "xhr", "fetch"}
+
+# Describe the encoded transfer, not the decoded body that is stored.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class ArchiveEntry(BaseModel):
+    method: str
+    url: str
+    request_body_sha256: str | None = None
+    status: int
+    headers: Dict[str, str]
+    body_sha256: str
+    recorded_at: str
+
+
+class ArchiveStats(BaseModel):
+    hits: int = 0
+    fuzzy_hits: int = 0  # served for a URL that differed from the recorded one
+    misses: int = 0
+    recorded: int = 0
+    bytes_served: int = 0
+
+
+def _volatile(param: str) -> bool:
+    param = param.lower()
+    return param in VOLATILE_PARAMS or param.startswith("cachebust")
+
+
+def _stable_key(method: str, url: str, body_sha256: str | None) -> tuple:
+    """The request, with the URL's fragment and cache-busting query
+    parameters dropped and the remaining parameters sorted."""
+    parts = urlparse(url)
+    params = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _volatile(key)
+    ]
+    query = urlencode(sorted(params))
+    return method, f"{parts.scheme}://{parts.netloc}{parts.path}?{query}", body_sha256
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class NetworkArchive:
+    """Recorded HTTP responses: bodies stored once each under their SHA-256 in
+    `bodies/`, plus an append-only `index.jsonl` of requests and responses.
+
+    `lookup` tries the exact method, URL and request body first, then, for
+    subresources (see `FUZZY_RESOURCE_TYPES`), the URL with cache-busting
+    query parameters removed (see `VOLATILE_PARAMS`) and the rest sorted.
+    Later recordings of a request take precedence.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._bodies = self.directory / "bodies"
+        self._bodies.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.directory / "index.jsonl"
+        self._lock = threading.Lock()
+        self._exact: Dict[tuple, ArchiveEntry] = {}
+        self._stable: Dict[tuple, ArchiveEntry] = {}
+        self.entries = 0
+        if self._index_path.exists():
+            with open(self._index_path, "r") as f:
+                for line in f:
+                    try:
+                        self._add_to_index(ArchiveEntry(**json.loads(line)))
+                    except (json.JSONDecodeError, ValueError):
+                        continue  # torn line from an interrupted write
+
+    def _add_to_index(self, entry: ArchiveEntry):
+        self._exact[(entry.method, entry.url, entry.request_body_sha256)] = entry
+        self._stable[
+            _stable_key(entry.method, entry.url, entry.request_body_sha256)
+        ] = entry
+        self.entries += 1
+
+    def body_path(self, sha256: str) -> Path:
+        return self._bodies / sha256[:2] / sha256
+
+    def add(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        request_body: bytes | None = None,
+    ) -> ArchiveEntry:
+        sha256 = _sha256(body)
+        path = self.body_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        entry = ArchiveEntry(
+            method=method,
+            url=url,
+            request_body_sha256=_sha256(request_body) if request_body else None,
+            status=status,
+            headers={
+                k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS
+            },
+            body_sha256=sha256,
+            recorded_at=datetime.now().isoformat(),
+        )
+        with self._lock:
+            with open(self._index_path, "a") as f:
+                f.write(entry.json() + "\n")
+            self._add_to_index(entry)
+        return entry
+
+    def lookup(
+        self,
+        method: str,
+        url: str,
+        request_body: bytes | None = None,
+        resource_type: str | None = None,
+    ) -> tuple[Optional[ArchiveEntry], bool]:
+        """Return the best recorded response and whether the match was exact.
+        Only a `resource_type` in `FUZZY_RESOURCE_TYPES` gets a fuzzy match."""
+        body_sha = _sha256(request_body) if request_body else None
+        with self._lock:
+            entry = self._exact.get((method, url, body_sha))
+            if entry is not None:
+                return entry, True
+            if resource_type not in FUZZY_RESOURCE_TYPES:
+                return None, False
+            return self._stable.get(_stable_key(method, url, body_sha)), False
+
+    def requests(self) -> List[ArchiveEntry]:
+        """The latest recording of every distinct request."""
+        with self._lock:
+            return list(self._exact.values())
+
+    def body(self, entry: ArchiveEntry) -> bytes:
+        return self.body_path(entry.body_sha256).read_bytes()
+
+
+class NetworkArchiveRoute:
+    """Route handler that records every response of a browser context into a
+    `NetworkArchive`, or serves responses back from it.
+
+    - record: fetch from the network and archive every response.
+    - replay: serve archived responses; fetch and archive misses.
+    - offline: serve archived responses; misses fail as if disconnected.
+
+    Responses are fetched without following redirects, so the browser sees
+    (and replays) each hop itself.
+    """
+
+    def __init__(self, context, archive: NetworkArchive, mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown network archive mode: {mode}")
+        self.archive = archive
+        self.mode = mode
+        self.stats = ArchiveStats()
+        context.route("**/*", self._handle)
+
+    def _handle(self, route, request):
+        if self.mode != "record":
+            entry, exact = self.archive.lookup(
+                request.method,
+                request.url,
+                request.post_data_buffer,
+                request.resource_type,
+            )
+            if entry is not None:
+                body = self.archive.body(entry)
+                self.stats.hits += 1
+                self.stats.fuzzy_hits += int(not exact)
+                self.stats.bytes_served += len(body)
+                route.fulfill(status=entry.status, headers=entry.headers, body=body)
+                return
+            self.stats.misses += 1
+            if self.mode == "offline":
+                route.abort("internetdisconnected")
+                return
+
+        try:
+            response = route.fetch(max_redirects=0)
+            body = response.body()
+        except Exception:
+            route.abort("failed")
+            return
+        self.archive.add(
+            request.method,
+            request.url,
+            response.status,
+            response.headers,
+            body,
+            request.post_data_buffer,
+        )
+        self.stats.recorded += 1
+        route.fulfill(response=response, body=body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize a recorded network archive"
+    )
+    parser.add_argument("directory", type=str)
+    args = parser.parse_args()
+
+    archive = NetworkArchive(args.directory)
+    hosts: Counter = Counter()
+    body_bytes = sum(
+        path.stat().st_size for path in archive.directory.glob("bodies/*/*")
+    )
+    requests = archive.requests()
+    for entry in requests:
+        hosts[urlparse(entry.url).netloc] += 1
+
+    console.print(
+        f"{archive.entries} recorded responses, {len(requests)} distinct"
+        f" requests, {body_bytes / 1024 / 1024:.1f} MiB of unique bodies"
+    )
+    table = Table("host", "requests")
+    for host, count in hosts.most_common(20):
+        table.add_row(host, str(count))
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from typing import Optional
+from pydantic import BaseModel
+
+from memory import Memory, normalize_task
+from vector_index import embed
+
+
+class PlanMatch(BaseModel):
+    start_url: str
+    plan: str
+    matched_task: str
+    score: float  # similarity of the matched task; 1.0 for an exact match
+    successes: int
+    runs: int
+
+
+class PlannerStats(BaseModel):
+    lookups: int = 0
+    hits: int = 0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def mean_llm_seconds(self) -> float:
+        return self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        """Planner time avoided by hits, at the mean observed LLM latency."""
+        return self.hits * self.mean_llm_seconds
+
+
+class FastPlanner:
+    """Answers the planner's question, where to start, from memory.
+
+    A task whose normalized text matches a past task exactly, or whose
+    embedding is at least `min_score` similar to one, reuses that task's
+    start URL, provided episodes starting there succeeded at least
+    `min_success_rate` of the time. Anything else goes to the LLM planner.
+    """
+
+    def __init__(
+        self, memory: Memory, min_score: float = 0.85, min_success_rate: float = 0.5
+    ):
+        self.memory = memory
+        self.min_score = min_score
+        self.min_success_rate = min_success_rate
+        self.stats = PlannerStats()
+
+    def _best_url(self, task: str) -> Optional[tuple[str, int, int]]:
+        candidates = [
+            (url, successes, runs)
+            for url, (successes, runs) in self.memory.get_task_outcomes(task).items()
+            if url and successes and successes / runs >= self.min_success_rate
+        ]
+        return max(candidates, key=lambda c: (c[1], c[1] / c[2]), default=None)
+
+    def lookup(self, task: str) -> Optional[PlanMatch]:
+        self.stats.lookups += 1
+        matched, score, best = task, 1.0, self._best_url(task)
+
+        if best is None:
+            query = embed(task)
+            seen = {normalize_task(task)}
+            for episode in self.memory.search(task, k=10, min_score=self.min_score / 2):
+                if not episode["success"] or normalize_task(episode["task"]) in seen:
+                    continue
+                seen.add(normalize_task(episode["task"]))
+                # Index vectors include the URL, so rescore on the task alone.
+                similarity = float(query @ embed(episode["task"]))
+                if similarity >= self.min_score:
+                    best = self._best_url(episode["task"])
+                    if best is not None:
+                        matched, score = episode["task"], similarity
+                        break
+
+        if best is None:
+            return None
+        self.stats.hits += 1
+        start_url, successes, runs = best
+        return PlanMatch(
+            start_url=start_url,
+            plan=f"START_URL: {start_url}",
+            matched_task=matched,
+            score=round(score, 3),
+            successes=successes,
+            runs=runs,
+        )
+
+    def record_llm_call(self, seconds: float):
+        """Record the latency of a planner LLM call made after a miss."""
+        self.stats.llm_calls += 1
+        self.stats.llm_seconds += seconds
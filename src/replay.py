@@ -0,0 +1,82 @@
+import time
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+from pydantic import BaseModel
+
+from browser import Browser
+from screenshots import hash_distance, screen_hash
+
+
+class ReplayResult(BaseModel):
+    total_steps: int
+    replayed_steps: int
+    diverged_at: int | None = None  # index of the first step that didn't check out
+    reason: str | None = None
+    seconds: float
+    executed: List[Dict] = []  # replayed steps, re-recorded for the new trajectory
+
+    @property
+    def completed(self) -> bool:
+        return self.diverged_at is None
+
+
+def replayable(trajectory: List[Dict]) -> bool:
+    """Whether every step was recorded with the page it was taken on."""
+    return bool(trajectory) and all(
+        "url" in step and "screen_hash" in step for step in trajectory
+    )
+
+
+def same_page(a: str, b: str) -> bool:
+    """Compare URLs ignoring query and fragment, which often carry session
+    tokens and cache-busters."""
+    a, b = urlparse(a), urlparse(b)
+    return (a.netloc, a.path.rstrip("/")) == (b.netloc, b.path.rstrip("/"))
+
+
+class TrajectoryReplayer:
+    """Re-executes a recorded trajectory without asking the model.
+
+    Before each step the current page must match the page the step was
+    originally taken on: same URL (see `same_page`) and a screenshot hash at
+    most `max_distance` bits away. Replay stops at the first step that fails
+    that check or fails to execute, and the caller carries on with the model
+    from there.
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        execute: Callable[[Dict], bool],
+        max_distance: int = 6,
+    ):
+        self.browser = browser
+        self.execute = execute
+        self.max_distance = max_distance
+
+    def replay(self, trajectory: List[Dict]) -> ReplayResult:
+        start = time.perf_counter()
+        executed: List[Dict] = []
+
+        def result(reason: str | None = None) -> ReplayResult:
+            return ReplayResult(
+                total_steps=len(trajectory),
+                replayed_steps=len(executed),
+                diverged_at=None if reason is None else len(executed),
+                reason=reason,
+                seconds=round(time.perf_counter() - start, 3),
+                executed=executed,
+            )
+
+        for step in trajectory:
+            state = self.browser.get_state()
+            if not same_page(state.page_url, step["url"]):
+                return result(f"expected {step['url']}, at {state.page_url}")
+            current = screen_hash(state.screenshot)
+            distance = hash_distance(current, step["screen_hash"])
+            if distance > self.max_distance:
+                return result(f"screen differs by {distance} bits")
+            if not self.execute(step):
+                return result(f"{step['action']} failed")
+            executed.append({**step, "url": state.page_url, "screen_hash": current})
+        return result()
@@ -0,0 +1,61 @@
+from typing import List
+from pydantic import BaseModel
+
+from screenshots import hash_distance
+
+
+class LoopStats(BaseModel):
+    unchanged_steps: int = 0  # executed actions that left the screen as it was
+    skipped_inferences: int = 0  # model calls replaced by polling after a wait
+    skipped_actions: int = 0  # repeats of a known no-op that weren't executed
+    aborted_steps: int = 0  # iterations left when a hopeless loop was aborted
+
+    @property
+    def wasted_steps_avoided(self) -> int:
+        return self.skipped_inferences + self.skipped_actions + self.aborted_steps
+
+
+class ScreenChangeDetector:
+    """Tracks which actions change the screen, from consecutive screen hashes.
+
+    An action whose next screenshot is within `same_distance` bits of the one
+    it was taken on is a no-op on that screen. The agent uses this to tell the
+    model, to poll instead of re-inferring after a `wait` that changed
+    nothing, and to stop once the model keeps choosing an action that already
+    did nothing `max_repeats` times on the same screen.
+    """
+
+    def __init__(self, same_distance: int = 2, max_repeats: int = 3):
+        self.same_distance = same_distance
+        self.max_repeats = max_repeats
+        self.stats = LoopStats()
+        self._noops: List[tuple[str, str]] = []  # (action, screen hash)
+        self._pending: tuple[str, str] | None = None  # last executed, unobserved
+
+    def same(self, a: str, b: str) -> bool:
+        return hash_distance(a, b) <= self.same_distance
+
+    def observe(self, screen: str) -> bool | None:
+        """Compare `screen` with the screen the last executed action was taken
+        on. Returns whether it changed, or None if no action is pending."""
+        if self._pending is None:
+            return None
+        action, before = self._pending
+        self._pending = None
+        if self.same(screen, before):
+            self.stats.unchanged_steps += 1
+            self._noops.append((action, before))
+            return False
+        return True
+
+    def noop_count(self, action: str, screen: str) -> int:
+        """How often `action` has already done nothing on this screen."""
+        return sum(a == action and self.same(s, screen) for a, s in self._noops)
+
+    def executed(self, action: str, screen: str):
+        self._pending = (action, screen)
+
+    def skipped(self, action: str, screen: str):
+        """Count a repeat of a known no-op that was not executed."""
+        self.stats.skipped_actions += 1
+        self._noops.append((action, screen))
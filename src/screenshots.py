@@ -0,0 +1,177 @@
+import base64
+import io
+import math
+import os
+import queue
+import threading
+import time
+from pydantic import BaseModel
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+FORMATS = {mime: format for format, mime in MIME_TYPES.items()}
+
+# UI-TARS (Qwen2.5-VL) sees images in 28x28 patches.
+PATCH_SIZE = 28
+
+
+def to_data_url(data: bytes, mime_type: str) -> str:
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def smart_resize(
+    height: int,
+    width: int,
+    max_pixels: int,
+    min_pixels: int = 4 * PATCH_SIZE * PATCH_SIZE,
+    factor: int = PATCH_SIZE,
+) -> tuple[int, int]:
+    """Qwen2.5-VL's resize rule: keep the aspect ratio, make both sides multiples
+    of `factor`, and keep the pixel count within [min_pixels, max_pixels]."""
+    h_bar = max(factor, round(height / factor) * factor)
+    w_bar = max(factor, round(width / factor) * factor)
+    if h_bar * w_bar > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        h_bar = max(factor, math.floor(height / beta / factor) * factor)
+        w_bar = max(factor, math.floor(width / beta / factor) * factor)
+    elif h_bar * w_bar < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h_bar = math.ceil(height * beta / factor) * factor
+        w_bar = math.ceil(width * beta / factor) * factor
+    return h_bar, w_bar
+
+
+class ScreenTransform(BaseModel):
+    """Maps coordinates in the image the model saw back to the browser viewport."""
+
+    viewport_width: int
+    viewport_height: int
+    model_width: int
+    model_height: int
+
+    def to_viewport(self, x: float, y: float) -> tuple[int, int]:
+        vx = round(x * self.viewport_width / self.model_width)
+        vy = round(y * self.viewport_height / self.model_height)
+        return (
+            min(max(vx, 0), self.viewport_width - 1),
+            min(max(vy, 0), self.viewport_height - 1),
+        )
+
+
+def resize_for_model(
+    data: bytes, mime_type: str, max_pixels: int, quality: int = 80
+) -> tuple[bytes, ScreenTransform]:
+    """Downscale a screenshot to the model's pixel budget.
+
+    Returns the re-encoded image and the transform that maps the model's
+    coordinates back onto the original screenshot. A screenshot that already
+    fits the budget is returned as is: the model's processor only snaps it to
+    whole patches, which the transform accounts for.
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    model_height, model_width = smart_resize(height, width, max_pixels)
+    transform = ScreenTransform(
+        viewport_width=width,
+        viewport_height=height,
+        model_width=model_width,
+        model_height=model_height,
+    )
+    if width * height <= max_pixels:
+        return data, transform
+
+    resized = image.convert("RGB").resize(
+        (model_width, model_height), Image.Resampling.LANCZOS
+    )
+    out = io.BytesIO()
+    resized.save(out, format=FORMATS[mime_type].upper(), quality=quality)
+    return out.getvalue(), transform
+
+
+def reencode(png_bytes: bytes, format: str, quality: int) -> bytes:
+    """Re-encode a PNG screenshot into a format Playwright can't produce (WebP)."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(png_bytes))
+    out = io.BytesIO()
+    image.save(out, format=format.upper(), quality=quality)
+    return out.getvalue()
+
+
+def screen_hash(data: bytes, size: int = 16) -> str:
+    """Difference hash of a screenshot: `size`² bits, as hex.
+
+    Each bit says whether a cell of a (size+1)×size grayscale thumbnail is brighter
+    than its right neighbour, so small rendering differences (a caret, a
+    spinner, recompression) flip few bits while a different page flips many.
+    """
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.draft("L", (16 * size, 16 * size))  # JPEG only: decode at reduced scale
+    thumbnail = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    return np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes().hex()
+
+
+def hash_distance(a: str, b: str) -> int:
+    """Number of differing bits between two `screen_hash` values."""
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+class ScreenshotArchiver:
+    """Writes screenshots to disk on a background thread.
+
+    The queue is bounded so a slow disk can never stall an agent step; when it
+    is full, or a write fails, screenshots are dropped and counted in
+    `dropped` (the latest write failure is kept in `last_error`).
+    """
+
+    def __init__(self, directory: str, max_queue: int = 32):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.written = 0
+        self.dropped = 0
+        self.last_error: OSError | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="screenshot-archiver", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, data: bytes, format: str = "png"):
+        """Queue a screenshot for writing without blocking the caller."""
+        path = os.path.join(self.directory, f"screenshot_{time.time()}.{format}")
+        try:
+            self._queue.put_nowait((path, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            path, data = item
+            try:
+                with open(path, "wb") as f:
+                    f.write(data)
+                self.written += 1
+            except OSError as e:  # disk full, directory removed, ...
+                self.dropped += 1
+                self.last_error = e
+            self._queue.task_done()
+
+    def close(self, timeout: float = 30.0):
+        """Flush pending screenshots and stop the writer thread, waiting at
+        most `timeout` seconds so a stuck disk can't hang shutdown."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
@@ -0,0 +1,155 @@
+import hashlib
+import time
+from pydantic import BaseModel, Field
+
+# Installed in every document of the context. Records the time of the last DOM
+# mutation so the settler can ask "how long has the page been quiet?".
+SETTLE_INIT_SCRIPT = """
+(() => {
+  if (window.__settle) return;
+  const state = { lastMutation: performance.now() };
+  window.__settle = state;
+  new MutationObserver(() => {
+    state.lastMutation = performance.now();
+  }).observe(document, {
+    subtree: true,
+    childList: true,
+    attributes: true,
+    characterData: true,
+  });
+})();
+"""
+
+DOM_QUIET_QUERY = (
+    "() => window.__settle ? performance.now() - window.__settle.lastMutation : null"
+)
+
+# Long-lived connections never "finish", so they must not hold the page open.
+IGNORED_RESOURCE_TYPES = {"websocket", "eventsource"}
+
+
+class SettleConfig(BaseModel):
+    quiet_ms: int = 300  # network and DOM must be quiet for this long
+    poll_ms: int = 50
+    frame_interval_ms: int = 100  # gap between the two frames that must match
+    visual_check: bool = True
+    long_request_ms: int = 2000  # requests pending longer than this are ignored
+    default_max_wait_ms: int = 5000
+    max_wait_ms: dict[str, int] = Field(
+        default_factory=lambda: {
+            "click": 5000,
+            "left_double": 5000,
+            "right_single": 3000,
+            "drag": 3000,
+            "hotkey": 5000,
+            "type": 3000,
+            "scroll": 2000,
+            "goto_url": 15000,
+            "get_state": 3000,
+        }
+    )
+
+
+class SettleResult(BaseModel):
+    action: str
+    waited_ms: float
+    settled: bool  # False when the upper bound was hit first
+    inflight_requests: int
+    frames_compared: int
+
+
+class PageSettler:
+    """Waits until a page is quiescent: no pending requests, no recent DOM
+    mutations and two consecutive identical frames, bounded per action."""
+
+    def __init__(self, context, config: SettleConfig | None = None):
+        self.config = config or SettleConfig()
+        self._inflight: dict = {}  # request -> start time
+        self._last_network_activity = time.monotonic()
+
+        context.add_init_script(SETTLE_INIT_SCRIPT)
+        context.on("request", self._on_request)
+        context.on("requestfinished", self._on_request_done)
+        context.on("requestfailed", self._on_request_done)
+
+    def _on_request(self, request):
+        if request.resource_type in IGNORED_RESOURCE_TYPES:
+            return
+        now = time.monotonic()
+        self._inflight[request] = now
+        self._last_network_activity = now
+
+    def _on_request_done(self, request):
+        if self._inflight.pop(request, None) is not None:
+            self._last_network_activity = time.monotonic()
+
+    def _pending_requests(self, now: float) -> int:
+        cutoff = now - self.config.long_request_ms / 1000
+        return sum(1 for started in self._inflight.values() if started > cutoff)
+
+    def _network_quiet(self, now: float) -> bool:
+        if self._pending_requests(now):
+            return False
+        return (now - self._last_network_activity) * 1000 >= self.config.quiet_ms
+
+    def _dom_quiet(self, page) -> bool:
+        try:
+            quiet_for = page.evaluate(DOM_QUIET_QUERY)
+            if quiet_for is None:
+                # Page was created before the init script was registered.
+                page.evaluate(SETTLE_INIT_SCRIPT)
+                return False
+        except Exception:
+            # Execution context destroyed mid-navigation.
+            return False
+        return quiet_for >= self.config.quiet_ms
+
+    def _frame_digest(self, page) -> bytes | None:
+        try:
+            frame = page.screenshot(type="jpeg", quality=20, scale="css")
+        except Exception:
+            return None
+        return hashlib.blake2b(frame, digest_size=16).digest()
+
+    def settle(self, page, action: str) -> SettleResult:
+        """Block until `page` settles or the bound for `action` is reached."""
+        config = self.config
+        max_wait_ms = config.max_wait_ms.get(action, config.default_max_wait_ms)
+        start = time.monotonic()
+        deadline = start + max_wait_ms / 1000
+
+        previous_frame = None
+        frames_compared = 0
+        settled = False
+        while True:
+            now = time.monotonic()
+            if self._network_quiet(now) and self._dom_quiet(page):
+                if not config.visual_check:
+                    settled = True
+                    break
+                frame = self._frame_digest(page)
+                frames_compared += 1
+                if frame is not None and frame == previous_frame:
+                    settled = True
+                    break
+                previous_frame = frame
+                pause_ms = config.frame_interval_ms
+            else:
+                previous_frame = None
+                pause_ms = config.poll_ms
+
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                break
+            # wait_for_timeout keeps Playwright's event loop pumping, so the
+            # request listeners above stay up to date while we wait.
+            page.wait_for_timeout(min(pause_ms, remaining_ms))
+
+        end = time.monotonic()
+        return SettleResult(
+            action=action,
+            waited_ms=round((end - start) * 1000, 1),
+            settled=settled,
+            inflight_requests=self._pending_requests(end),
+            frames_compared=frames_compared,
+        )
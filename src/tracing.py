@@ -0,0 +1,378 @@
+import argparse
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Histogram bucket bounds for span durations, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Numeric span attributes that are also exported as running totals.
+SUMMED_ATTRIBUTES = ("prompt_tokens", "image_bytes")
+
+_span_ids = itertools.count(1)
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A timed operation. Entering it makes it the parent of spans started
+    inside it, in the same thread."""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "attributes",
+        "parent",
+        "trace_id",
+        "span_id",
+        "start",
+        "duration_ms",
+        "error",
+        "_started",
+        "_token",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = _current.get()
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex
+        self.span_id = next(_span_ids)
+        self.duration_ms = 0.0
+        self.error = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer.finish(self)
+        return False
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished span to `path`."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.record(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            if span.parent is None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
+    """Aggregates spans into a duration histogram, an error counter and totals
+    of `SUMMED_ATTRIBUTES` per span name, and writes them in the Prometheus
+    text format to `path` when a root span ends, at most every `interval`
+    seconds, and on close (e.g. for node_exporter's textfile collector)."""
+
+    def __init__(self, path: str, prefix: str = "agent", interval: float = 5.0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.prefix = prefix
+        self.interval = interval
+        self._written = 0.0
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[int]] = defaultdict(
+            lambda: [0] * (len(BUCKETS) + 1)
+        )
+        self._seconds: Dict[str, float] = defaultdict(float)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._totals: Dict[tuple[str, str], float] = defaultdict(float)
+
+    def export(self, span: Span):
+        seconds = span.duration_ms / 1000
+        with self._lock:
+            self._buckets[span.name][bisect_left(BUCKETS, seconds)] += 1
+            self._seconds[span.name] += seconds
+            if span.error:
+                self._errors[span.name] += 1
+            for attribute in SUMMED_ATTRIBUTES:
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    self._totals[span.name, attribute] += value
+        if span.parent is None and time.monotonic() - self._written >= self.interval:
+            self.write()
+
+    def render(self) -> str:
+        name = f"{self.prefix}_span_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in traced operations.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for span_name, counts in sorted(self._buckets.items()):
+                label = f'span="{_escape(span_name)}"'
+                cumulative = 0
+                for bound, count in zip([*BUCKETS, "+Inf"], counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label}}} {self._seconds[span_name]:.6f}")
+                lines.append(f"{name}_count{{{label}}} {cumulative}")
+
+            name = f"{self.prefix}_span_errors_total"
+            lines += [
+                f"# HELP {name} Traced operations that raised.",
+                f"# TYPE {name} counter",
+            ]
+            for span_name in sorted(self._buckets):
+                label = f'span="{_escape(span_name)}"'
+                lines.append(f"{name}{{{label}}} {self._errors[span_name]}")
+
+            for attribute in SUMMED_ATTRIBUTES:
+                name = f"{self.prefix}_{attribute}_total"
+                rows = sorted(
+                    (span_name, value)
+                    for (span_name, key), value in self._totals.items()
+                    if key == attribute
+                )
+                if not rows:
+                    continue
+                lines += [
+                    f"# HELP {name} Sum of the {attribute} span attribute.",
+                    f"# TYPE {name} counter",
+                ]
+                for span_name, value in rows:
+                    lines.append(f'{name}{{span="{_escape(span_name)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Replace the snapshot atomically, so readers never see half of it."""
+        self._written = time.monotonic()
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+
+    def close(self):
+        self.write()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class LiveStepTable:
+    """A live `rich` table of the latest agent steps and where their time
+    went, by the first part of the names of each step's direct child spans."""
+
+    COLUMNS = ("browser", "ui_tars", "llm")
+
+    def __init__(self, rows: int = 15):
+        from rich.live import Live
+
+        self._lock = threading.Lock()
+        self._children: Dict[int, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._steps: deque = deque(maxlen=rows)
+        self._live = Live(self._render(), refresh_per_second=4)
+        self._live.start()
+
+    def export(self, span: Span):
+        with self._lock:
+            if span.name == "agent.step":
+                self._steps.append((span, self._children.pop(span.span_id, {})))
+                self._live.update(self._render())
+            elif span.parent is not None and span.parent.name == "agent.step":
+                category = span.name.split(".")[0]
+                self._children[span.parent.span_id][category] += span.duration_ms
+
+    def _render(self):
+        from rich.table import Table
+
+        table = Table("step", "action", "url", "total ms", *self.COLUMNS, "other")
+        for span, children in self._steps:
+            spent = [children.get(column, 0.0) for column in self.COLUMNS]
+            table.add_row(
+                str(span.attributes.get("iteration", "")),
+                str(span.attributes.get("action", "")),
+                str(span.attributes.get("url", ""))[:48],
+                f"{span.duration_ms:.0f}",
+                *(f"{ms:.0f}" for ms in spent),
+                f"{span.duration_ms - sum(spent):.0f}",
+            )
+        return table
+
+    def close(self):
+        self._live.stop()
+
+
+class Tracer:
+    def __init__(self, exporters: List):
+        self.exporters = exporters
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        return Span(self, name, attributes or {})
+
+    def finish(self, span: Span):
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+
+# Off by default; `span` and `traced` only check this when it is None.
+_tracer: Tracer | None = None
+
+
+def configure_tracing(
+    trace_path: str | None = None,
+    metrics_path: str | None = None,
+    live: bool = False,
+) -> Tracer:
+    """Start recording spans: to a JSONL file at `trace_path`, as a Prometheus
+    text snapshot at `metrics_path`, and/or in a live table of step timings."""
+    global _tracer
+    disable_tracing()
+    exporters = []
+    if trace_path:
+        exporters.append(JsonlExporter(trace_path))
+    if metrics_path:
+        exporters.append(PrometheusExporter(metrics_path))
+    if live:
+        exporters.append(LiveStepTable())
+    _tracer = Tracer(exporters)
+    return _tracer
+
+
+def disable_tracing():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = None
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """A context manager timing its block as `name`; a shared no-op when
+    tracing is off."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, attributes)
+
+
+def annotate(**attributes: Any):
+    """Add attributes to the innermost open span, if tracing is on."""
+    if _tracer is None:
+        return
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def traced(name: str, attributes: Callable[..., Dict[str, Any]] | None = None):
+    """Decorate a function to run in a span named `name`. `attributes` is
+    called with the function's arguments, and only when tracing is on."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(name, attributes(*args, **kwargs) if attributes else None):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Summarize a JSONL trace file")
+    parser.add_argument("path", type=str)
+    args = parser.parse_args()
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    with open(args.path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            durations[record["name"]].append(record["duration_ms"])
+            errors[record["name"]] += record["status"] == "error"
+
+    table = Table("span", "count", "total ms", "mean ms", "p95 ms", "errors")
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        table.add_row(
+            name,
+            str(len(values)),
+            f"{sum(values):.0f}",
+            f"{sum(values) / len(values):.1f}",
+            f"{_percentile(values, 0.95):.1f}",
+            str(errors[name]),
+        )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from locking import file_lock
+
+DIM = 128
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Locally computed text embedding: signed feature hashing of words, word
+    bigrams and character trigrams, L2-normalized. Deterministic across
+    processes, so vectors can be persisted and compared later."""
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"#{token}#"
+        features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """Append-only cosine-similarity index persisted as raw float32 rows plus a
+    JSONL file of keys.
+
+    Re-adding a key supersedes its earlier row. Small indexes are searched
+    exhaustively. Past `ivf_threshold` rows, an inverted-file index is built:
+    rows are grouped under ~sqrt(n) k-means centroids and stored contiguously
+    per cluster, and a query scans only the `nprobe` nearest clusters plus rows
+    added since the last build. That keeps top-k queries around a
+    millisecond at 100k rows.
+
+    Several processes may share a directory: appends hold an exclusive lock
+    on its `.lock` file, and every add and search first reads the rows other
+    processes appended since.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int = DIM,
+        ivf_threshold: int = 20000,
+        nprobe: int = 8,
+        max_unclustered: int = 2048,
+    ):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.max_unclustered = max_unclustered
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._keys_path = self.directory / "keys.jsonl"
+        self._lock_path = self.directory / ".lock"
+        self._lock = threading.Lock()
+        self._reset()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _reset(self):
+        self._vectors = np.zeros((1024, self.dim), dtype=np.float32)
+        self._keys: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._ivf = None
+        self._keys_bytes = 0  # how much of the keys file has been read
+
+    def refresh(self):
+        """Load rows appended to the files by other processes."""
+        with self._lock, file_lock(self._lock_path, shared=True):
+            self._read_new_rows()
+
+    def _read_new_rows(self):
+        size = self._keys_path.stat().st_size if self._keys_path.exists() else 0
+        if size == self._keys_bytes:
+            return
+        if size < self._keys_bytes:
+            self._reset()  # cleared by another process
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_bytes)
+            lines = f.read().split(b"\n")[:-1]  # the last is empty or torn
+        vectors = (
+            np.fromfile(
+                self._vectors_path,
+                dtype=np.float32,
+                offset=len(self._keys) * self.dim * 4,
+                count=len(lines) * self.dim,
+            )
+            if self._vectors_path.exists()
+            else np.zeros(0, dtype=np.float32)
+        )
+        count = min(len(lines), len(vectors) // self.dim)
+        keys = [json.loads(line)["key"] for line in lines[:count]]
+        self._append_rows(keys, vectors[: count * self.dim].reshape(-1, self.dim))
+        self._keys_bytes += sum(len(line) + 1 for line in lines[:count])
+
+    def _append_rows(self, keys: List[str], vectors: np.ndarray):
+        start = len(self._keys)
+        needed = start + len(keys)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:start] = self._vectors[:start]
+            self._vectors = grown
+        self._vectors[start:needed] = vectors
+        for offset, key in enumerate(keys):
+            self._keys.append(key)
+            self._row_of[key] = start + offset
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._row_of
+
+    def add(self, key: str, text: str):
+        """Embed `text` and store it under `key`, persisting it immediately."""
+        self.add_many([(key, text)])
+
+    def add_many(self, items: List[Tuple[str, str]]):
+        if not items:
+            return
+        keys = [key for key, _ in items]
+        vectors = np.stack([embed(text, self.dim) for _, text in items])
+        lines = "".join(json.dumps({"key": key}) + "\n" for key in keys).encode()
+        with self._lock, file_lock(self._lock_path):
+            # Catch up first, so rows in memory are in file order.
+            self._read_new_rows()
+            # Vectors first: a crash in between leaves extra vectors or a torn
+            # key line, never keys without a vector. Either is cut off here.
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(len(self._keys) * self.dim * 4)
+                f.write(vectors.tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.truncate(self._keys_bytes)
+                f.write(lines)
+            self._append_rows(keys, vectors)
+            self._keys_bytes += len(lines)
+
+    def _build_ivf(self):
+        count = len(self._keys)
+        vectors = self._vectors[:count]
+        n_clusters = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample_size = min(count, 64 * n_clusters)
+        sample = vectors[rng.choice(count, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_clusters, replace=False)]
+        for _ in range(8):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        self._ivf = {
+            "centroids": centroids,
+            "vectors": vectors[order],
+            "rows": order,
+            "offsets": np.searchsorted(assignment[order], np.arange(n_clusters + 1)),
+            "built_at": count,
+        }
+
+    def _score(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate rows and their scores for `query`."""
+        count = len(self._keys)
+        if count < self.ivf_threshold:
+            return np.arange(count), self._vectors[:count] @ query
+        if self._ivf is None or count - self._ivf["built_at"] > self.max_unclustered:
+            self._build_ivf()
+        ivf = self._ivf
+        nearest = np.argsort(ivf["centroids"] @ query)[-self.nprobe :]
+        row_parts, score_parts = [], []
+        for c in nearest:
+            lo, hi = ivf["offsets"][c], ivf["offsets"][c + 1]
+            row_parts.append(ivf["rows"][lo:hi])
+            score_parts.append(ivf["vectors"][lo:hi] @ query)
+        # Rows added since the build are scanned exhaustively.
+        row_parts.append(np.arange(ivf["built_at"], count))
+        score_parts.append(self._vectors[ivf["built_at"] : count] @ query)
+        return np.concatenate(row_parts), np.concatenate(score_parts)
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Return up to `k` (key, cosine similarity) pairs, best first."""
+        query = embed(text, self.dim)
+        with self._lock:
+            with file_lock(self._lock_path, shared=True):
+                self._read_new_rows()
+            if not self._keys:
+                return []
+            rows, scores = self._score(query)
+            # Rows superseded by a later add of the same key are skipped, so
+            # rank a few extra candidates and only sort everything if needed.
+            m = min(len(scores), 4 * k)
+            top = np.argpartition(scores, len(scores) - m)[len(scores) - m :]
+            results = self._latest(rows, scores, top[np.argsort(scores[top])[::-1]], k)
+            if len(results) < k and m < len(scores):
+                results = self._latest(rows, scores, np.argsort(scores)[::-1], k)
+            return results
+
+    def _latest(self, rows, scores, order, k: int) -> List[Tuple[str, float]]:
+        results = []
+        for i in order:
+            key = self._keys[rows[i]]
+            if self._row_of[key] == rows[i]:
+                results.append((key, float(scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def clear(self):
+        with self._lock, file_lock(self._lock_path):
+            for path in (self._vectors_path, self._keys_path):
+                if path.exists():
+                    os.remove(path)
+            self._reset()
@@ -0,0 +1,73 @@
+import pytest
+
+from agent import Agent
+from screenshots import ScreenTransform
+
+# A 1280x720 viewport shown to the model at 840x448.
+TRANSFORM = ScreenTransform(
+    viewport_width=1280, viewport_height=720, model_width=840, model_height=448
+)
+
+
+@pytest.fixture
+def agent():
+    # _parse_action needs no browser or memory.
+    return Agent.__new__(Agent)
+
+
+@pytest.mark.parametrize(
+    "action, args",
+    [
+        ("click(start_box='(420,224)')", {"x": "640", "y": "360"}),
+        ("click(start_box='<point>420 224</point>')", {"x": "640", "y": "360"}),
+        ("click(start_box='(400,200,440,248)')", {"x": "640", "y": "360"}),
+        ("click(point='(0,0)')", {"x": "0", "y": "0"}),
+        ("click(start_box='(840,448)')", {"x": "1279", "y": "719"}),
+    ],
+)
+def test_click_is_scaled_to_the_viewport(agent, action, args):
+    parsed = agent._parse_action(action, TRANSFORM)
+    assert parsed.action == "click"
+    assert parsed.args == args
+
+
+def test_drag_scales_both_ends(agent):
+    parsed = agent._parse_action(
+        "drag(start_box='(105,112)', end_box='(630,336)')", TRANSFORM
+    )
+    assert parsed.args == {
+        "start_x": "160",
+        "start_y": "180",
+        "end_x": "960",
+        "end_y": "540",
+    }
+
+
+def test_scroll_is_scaled_and_keeps_its_direction(agent):
+    parsed = agent._parse_action(
+        "scroll(point='<point>210 112</point>', direction='down')", TRANSFORM
+    )
+    assert parsed.args == {"x": "320", "y": "180", "direction": "down"}
+
+
+@pytest.mark.parametrize(
+    "action, args",
+    [
+        ("click(start_box='(420,224)')", {"x": "420", "y": "224"}),
+        (
+            "drag(start_box='(105,112)', end_box='(630,336)')",
+            {"start_x": "105", "start_y": "112", "end_x": "630", "end_y": "336"},
+        ),
+        (
+            "scroll(start_box='(210,112)', direction='up')",
+            {"x": "210", "y": "112", "direction": "up"},
+        ),
+    ],
+)
+def test_points_are_unchanged_without_a_transform(agent, action, args):
+    assert agent._parse_action(action).args == args
+
+
+def test_non_pointer_actions_ignore_the_transform(agent):
+    parsed = agent._parse_action("type(content='hello')", TRANSFORM)
+    assert parsed.args == {"content": "hello"}
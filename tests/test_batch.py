@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+
+from rich.console import Console
+
+from agent import Action, Agent
+from batch import BatchTask, BatchWorker
+
+
+class SlowBrowser:
+    def click(self, x: int, y: int):
+        time.sleep(2)
+
+
+class FakePool:
+    @contextmanager
+    def lease(self):
+        yield SlowBrowser()
+
+
+class ClickingAgent(Agent):
+    """Runs the real `_execute_action`, which catches `Exception`."""
+
+    def __init__(self):
+        self.console = Console(quiet=True)
+        self.last_success = None
+
+    def attach_browser(self, browser):
+        self.browser = browser
+
+    def run(self, task: str, max_iterations: int = 5):
+        for _ in range(max_iterations):
+            self._execute_action(Action(action="click", args={"x": "1", "y": "1"}))
+        return "ran every step"
+
+
+def _worker(timeout: int) -> BatchWorker:
+    worker = BatchWorker.__new__(BatchWorker)
+    worker.settings = {"timeout": timeout, "max_iterations": 3, "verbose": False}
+    worker.pool = FakePool()
+    worker.agent = ClickingAgent()
+    return worker
+
+
+def test_timeout_inside_a_browser_action_is_reported():
+    start = time.perf_counter()
+    result = _worker(timeout=1).run(BatchTask(id="t1", task="click forever"))
+    assert result.status == "timeout"
+    assert result.result is None
+    assert "timed out after 1s" in result.error
+    assert time.perf_counter() - start < 3
+
+
+def test_task_within_its_timeout_is_done():
+    result = _worker(timeout=30).run(
+        BatchTask(id="t2", task="click once", max_iterations=1)
+    )
+    assert result.status == "done"
+    assert result.result == "ran every step"
@@ -0,0 +1,101 @@
+from contextlib import ExitStack
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, process):
+        self.process = process
+        self.closed = False
+
+    def storage_state(self):
+        return {"cookies": [], "origins": []}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeProcess:
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    def new_context(self, storage_state=None):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = self
+
+    def start(self):
+        return self
+
+    def launch(self, headless, timeout):
+        return FakeProcess()
+
+    def stop(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, context, **kwargs):
+        self.context = context
+
+    def close(self):
+        self.context.close()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(browser_pool, "sync_playwright", FakePlaywright)
+    monkeypatch.setattr(browser_pool, "Browser", FakeBrowser)
+    pool = BrowserPool(size=3)
+    yield pool
+    pool.close()
+
+
+def test_sequential_leases_rotate_through_every_process(pool):
+    processes = []
+    for _ in range(6):
+        with pool.lease() as browser:
+            processes.append(browser.context.process)
+    assert processes[:3] == pool._processes
+    assert processes[3:] == pool._processes
+
+
+def test_concurrent_leases_use_idle_processes(pool):
+    with ExitStack() as stack:
+        browsers = [stack.enter_context(pool.lease()) for _ in range(3)]
+        assert {id(b.context.process) for b in browsers} == {
+            id(p) for p in pool._processes
+        }
+
+
+def test_failed_storage_save_still_closes_and_replenishes(pool):
+    def crashed():
+        raise RuntimeError("Target page, context or browser has been closed")
+
+    with pool.lease(storage_key="site") as browser:
+        context = browser.context
+        context.storage_state = crashed
+    assert context.closed
+    assert "site" not in pool._storage_states
+    assert all(spare is not None for spare in pool._spares)
+    assert pool.stats.leases == 1
+
+
+def test_storage_state_carries_over_to_the_next_lease(pool):
+    with pool.lease(storage_key="site"):
+        pass
+    assert pool._storage_states["site"] == {"cookies": [], "origins": []}
@@ -0,0 +1,99 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from consolidation import ConsolidationWorker
+from memory_store import JsonMemoryStore, SqliteMemoryStore
+
+LIVE_PID = 1  # always running, like a recycled pid
+
+
+class FailingMemory:
+    """Just enough of `Memory` for a worker whose consolidations always fail."""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = 0
+
+    def _generate_insights(self, task, result, success):
+        self.calls += 1
+        raise ValueError("malformed episode")
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        return JsonMemoryStore(str(tmp_path / "memory.json"))
+    return SqliteMemoryStore(str(tmp_path / "memory.db"))
+
+
+def _payload():
+    return {
+        "task": "buy a hat",
+        "result": "",
+        "success": False,
+        "trajectory": [],
+        "url": "http://shop.test/",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def _worker(memory, **kwargs) -> ConsolidationWorker:
+    worker = ConsolidationWorker(memory, **kwargs)
+    worker.console.quiet = True
+    worker.close()
+    return worker
+
+
+def test_live_owner_with_a_fresh_claim_keeps_its_jobs(store):
+    store.enqueue_job(LIVE_PID, _payload())
+    memory = FailingMemory(store)
+    _worker(memory)
+    assert memory.calls == 0
+    assert store.get_job_owners() == [LIVE_PID]
+
+
+def test_stale_claims_are_replayed_and_failing_jobs_dropped(store):
+    job_id = store.enqueue_job(LIVE_PID, _payload())
+    memory = FailingMemory(store)
+    for attempt in range(1, 4):
+        assert store.get_job_owners() == [LIVE_PID]
+        worker = _worker(memory, max_attempts=3, stale_after=0)
+        assert memory.calls == attempt
+        # Hand it back, as if this process had died with the job claimed.
+        store.claim_jobs(worker._pid, LIVE_PID)
+    assert store.get_job_owners() == []
+    assert store.start_job(job_id) is None
+
+
+def test_job_whose_attempts_never_returned_is_dropped(store):
+    job_id = store.enqueue_job(LIVE_PID, _payload())
+    for _ in range(3):
+        store.start_job(job_id)  # each crashed the process
+    memory = FailingMemory(store)
+    _worker(memory, max_attempts=3, stale_after=0)
+    assert memory.calls == 0
+    assert store.get_job_owners() == []
+
+
+def test_older_database_gains_the_retry_columns(tmp_path):
+    path = str(tmp_path / "memory.db")
+    created = (datetime.now() - timedelta(days=1)).isoformat()
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE pending_jobs (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " owner INTEGER NOT NULL, payload TEXT NOT NULL, created_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO pending_jobs (owner, payload, created_at) VALUES (?, '{}', ?)",
+        (LIVE_PID, created),
+    )
+    conn.commit()
+    conn.close()
+
+    store = SqliteMemoryStore(path)
+    hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
+    claimed = store.claim_stale_jobs(2, hour_ago)  # claimed when created
+    assert [job["id"] for job in claimed] == [1]
+    assert store.start_job(1) == 1
@@ -0,0 +1,50 @@
+import sqlite3
+import time
+
+from models.llm_cache import LLMCache
+
+
+def _sum(cache: LLMCache) -> int:
+    row = cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses")
+    return row.fetchone()[0]
+
+
+def test_running_total_follows_every_write(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 20)
+    cache.put("a", "z" * 5)  # overwrite
+    assert cache.total_bytes() == _sum(cache) == 25
+    cache.invalidate("b")
+    assert cache.total_bytes() == _sum(cache) == 5
+    cache.ttl_seconds = -1
+    assert cache.get("a") is None  # expired
+    assert cache.total_bytes() == _sum(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_bytes=100)
+    for i in range(10):
+        cache.put(f"k{i}", "x" * 30)
+        time.sleep(0.001)
+    assert cache.total_bytes() == _sum(cache) == 90
+    assert cache.get("k0") is None
+    assert cache.get("k9") is not None
+    assert cache.stats.evictions == 7
+
+
+def test_existing_cache_is_seeded_with_its_size(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE responses (key TEXT PRIMARY KEY, content TEXT NOT NULL,"
+        " size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO responses VALUES ('old', 'abc', 3, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = LLMCache(path)
+    assert cache.total_bytes() == 3
+    cache.put("new", "defg")
+    assert cache.total_bytes() == 7
@@ -0,0 +1,26 @@
+import json
+
+from memory import Insight, MemoryEntry, _compact
+
+
+def test_summary_prompts_leave_out_replay_fields():
+    entry = MemoryEntry(
+        task="find the returns policy",
+        success=True,
+        trajectory=[
+            {
+                "action": "click",
+                "args": {"x": "10", "y": "20"},
+                "url": "http://shop.test/help",
+                "screen_hash": "f0e1d2c3b4a59687",
+            }
+        ],
+        url="http://shop.test/",
+        insights=Insight(key_learnings=[], improvement_areas=[], success_factors=[]),
+    )
+    [record] = json.loads(_compact([entry]))
+    assert record["trajectory"] == [{"action": "click", "args": {"x": "10", "y": "20"}}]
+    assert record["url"] == "http://shop.test/"
+    assert "screen_hash" not in _compact([entry])
+    # The stored episode keeps them for replay.
+    assert entry.trajectory[0]["screen_hash"] == "f0e1d2c3b4a59687"
@@ -0,0 +1,46 @@
+import pytest
+
+from network_archive import NetworkArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return NetworkArchive(str(tmp_path / "archive"))
+
+
+def _record(archive, url, body):
+    archive.add("GET", url, 200, {"content-type": "text/html"}, body)
+
+
+@pytest.mark.parametrize("resource_type", ["document", "xhr", "script"])
+def test_content_parameters_do_not_collide(archive, resource_type):
+    _record(archive, "https://video.test/watch?v=A", b"video A")
+    _record(archive, "https://shop.test/item?id=1234567890", b"item 1234567890")
+    for url in (
+        "https://video.test/watch?v=B",
+        "https://shop.test/item?id=9876543210",
+    ):
+        entry, exact = archive.lookup("GET", url, resource_type=resource_type)
+        assert entry is None
+
+
+def test_cache_busters_are_ignored_for_subresources(archive):
+    _record(archive, "https://cdn.test/app.js?b=2&cb=111&_=1712", b"app")
+    for params in ("b=2&cb=222&_=1713", "_=9&b=2&cachebuster=5", "b=2"):
+        entry, exact = archive.lookup(
+            "GET", f"https://cdn.test/app.js?{params}", resource_type="script"
+        )
+        assert archive.body(entry) == b"app"
+        assert not exact
+
+
+def test_documents_only_match_exactly(archive):
+    _record(archive, "https://news.test/?_=1712", b"front page")
+    entry, _ = archive.lookup(
+        "GET", "https://news.test/?_=1713", resource_type="document"
+    )
+    assert entry is None
+    entry, exact = archive.lookup(
+        "GET", "https://news.test/?_=1712", resource_type="document"
+    )
+    assert exact and archive.body(entry) == b"front page"
@@ -0,0 +1,146 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from screenshots import (
+    PATCH_SIZE,
+    ScreenshotArchiver,
+    ScreenTransform,
+    resize_for_model,
+    smart_resize,
+)
+
+VIEWPORTS = [(720, 1280), (1080, 1920), (900, 1440), (768, 1024), (1600, 2560)]
+
+
+@pytest.mark.parametrize("height, width", VIEWPORTS)
+@pytest.mark.parametrize("max_pixels", [401408, 1003520, 2116800])
+def test_smart_resize_respects_patches_budget_and_aspect(height, width, max_pixels):
+    model_height, model_width = smart_resize(height, width, max_pixels)
+    assert model_height % PATCH_SIZE == 0
+    assert model_width % PATCH_SIZE == 0
+    assert model_height * model_width <= max_pixels
+    # Rounding to whole patches moves each side by at most one patch.
+    assert model_width / model_height == pytest.approx(
+        width / height, rel=2 * PATCH_SIZE / min(model_height, model_width)
+    )
+
+
+def test_smart_resize_rounds_to_patches_within_budget():
+    assert smart_resize(728, 1288, 10_000_000) == (728, 1288)
+    assert smart_resize(720, 1280, 10_000_000) == (728, 1288)
+
+
+def test_smart_resize_scales_down_to_max_pixels():
+    assert smart_resize(720, 1280, 401408) == (448, 840)
+
+
+def test_smart_resize_scales_up_to_min_pixels():
+    min_pixels = 4 * PATCH_SIZE * PATCH_SIZE
+    model_height, model_width = smart_resize(20, 30, max_pixels=401408)
+    assert model_height * model_width >= min_pixels
+    assert (model_height, model_width) == (56, 84)
+
+
+def _transform(height: int, width: int, max_pixels: int) -> ScreenTransform:
+    model_height, model_width = smart_resize(height, width, max_pixels)
+    return ScreenTransform(
+        viewport_width=width,
+        viewport_height=height,
+        model_width=model_width,
+        model_height=model_height,
+    )
+
+
+@pytest.mark.parametrize("height, width", VIEWPORTS)
+def test_round_trip_from_model_to_viewport_is_within_a_few_pixels(height, width):
+    transform = _transform(height, width, 401408)
+    scale_x = transform.model_width / width
+    scale_y = transform.model_height / height
+    for vx in range(0, width, 37):
+        for vy in range(0, height, 41):
+            # Where the model would point, to the nearest model pixel.
+            x, y = round(vx * scale_x), round(vy * scale_y)
+            back_x, back_y = transform.to_viewport(x, y)
+            assert abs(back_x - vx) <= 1 / scale_x
+            assert abs(back_y - vy) <= 1 / scale_y
+
+
+def test_to_viewport_clamps_to_the_edges():
+    transform = _transform(720, 1280, 401408)
+    assert transform.to_viewport(0, 0) == (0, 0)
+    assert transform.to_viewport(-5, -5) == (0, 0)
+    assert transform.to_viewport(transform.model_width, transform.model_height) == (
+        1279,
+        719,
+    )
+    assert transform.to_viewport(10_000, 10_000) == (1279, 719)
+
+
+def _synthetic_page(width: int, height: int, boxes) -> bytes:
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for left, top, right, bottom in boxes:
+        draw.rectangle((left, top, right, bottom), fill="red")
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _red_center(image: Image.Image) -> tuple[float, float]:
+    pixels = image.convert("RGB").load()
+    xs, ys = [], []
+    for x in range(image.width):
+        for y in range(image.height):
+            r, g, b = pixels[x, y]
+            if r > 200 and g < 80 and b < 80:
+                xs.append(x)
+                ys.append(y)
+    return sum(xs) / len(xs), sum(ys) / len(ys)
+
+
+@pytest.mark.parametrize(
+    "box",
+    [(40, 30, 80, 60), (600, 340, 680, 380), (1220, 660, 1270, 710)],
+)
+def test_element_found_in_the_model_image_maps_back_onto_the_page(box):
+    data = _synthetic_page(1280, 720, [box])
+    resized, transform = resize_for_model(data, "image/png", 401408)
+    image = Image.open(io.BytesIO(resized))
+    assert image.size == (transform.model_width, transform.model_height) == (840, 448)
+
+    x, y = transform.to_viewport(*_red_center(image))
+    assert abs(x - (box[0] + box[2]) / 2) <= 3
+    assert abs(y - (box[1] + box[3]) / 2) <= 3
+
+
+def test_resize_for_model_leaves_small_screenshots_untouched():
+    data = _synthetic_page(840, 448, [(10, 10, 20, 20)])
+    resized, transform = resize_for_model(data, "image/png", 401408)
+    assert resized is data
+    assert transform.to_viewport(15, 15) == (15, 15)
+
+
+def test_archiver_counts_failed_writes_and_still_closes(tmp_path):
+    archiver = ScreenshotArchiver(str(tmp_path / "shots"))
+    archiver.submit(b"first")
+    archiver._queue.join()
+    (tmp_path / "shots").rename(tmp_path / "moved")  # directory removed
+    for _ in range(40):
+        archiver.submit(b"lost")
+    archiver.close(timeout=5)
+    assert archiver.written == 1
+    assert archiver.dropped == 40
+    assert isinstance(archiver.last_error, OSError)
+    assert not archiver._thread.is_alive()
+
+
+def test_resize_for_model_skips_screenshots_within_budget():
+    # The agent's default budget: a 1280x720 viewport is only snapped to
+    # patches (1288x728) by the model's processor, so it isn't re-encoded.
+    data = _synthetic_page(1280, 720, [(600, 340, 680, 380)])
+    resized, transform = resize_for_model(data, "image/png", 1280 * 28 * 28)
+    assert resized is data
+    assert (transform.model_width, transform.model_height) == (1288, 728)
+    assert transform.to_viewport(644, 364) == (640, 360)
@@ -0,0 +1,66 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from models import uitars
+
+
+class FakePipeline:
+    """Records how many generations overlap."""
+
+    def __init__(self):
+        self.processor = SimpleNamespace(tokenizer=SimpleNamespace(padding_side=None))
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, max_new_tokens, batch_size=None):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.02)
+        with self._lock:
+            self.running -= 1
+        reply = [{"generated_text": [{"content": "Action: wait()"}]}]
+        return [reply for _ in text] if batch_size else reply
+
+
+@pytest.fixture
+def pipe(monkeypatch):
+    pipe = FakePipeline()
+    monkeypatch.setattr(uitars, "_pipe", pipe)
+    monkeypatch.setattr(uitars, "_client", None)
+    monkeypatch.setattr(uitars, "_prefix_settings", None)
+    monkeypatch.setattr(uitars, "_batcher", None)
+    return pipe
+
+
+def test_single_and_batched_generations_never_overlap(pipe):
+    messages = [{"role": "user", "content": []}]
+    calls = [lambda: uitars.local_generate(messages)] * 4 + [
+        lambda: uitars.local_generate_batch([messages, messages])
+    ] * 4
+    threads = [threading.Thread(target=call) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pipe.max_running == 1
+
+
+def test_batches_leave_the_shared_tokenizer_alone(pipe):
+    messages = [{"role": "user", "content": []}]
+    assert uitars.local_generate_batch([messages, messages]) == ["Action: wait()"] * 2
+    assert pipe.processor.tokenizer.padding_side is None
+
+
+def test_tokenizer_is_left_padded_once_on_load(monkeypatch):
+    from models import uitars_backends
+
+    monkeypatch.setattr(uitars, "_pipe", None)
+    monkeypatch.setattr(uitars, "load_seconds", None)
+    monkeypatch.setattr(uitars_backends, "load_pipeline", lambda *_: FakePipeline())
+    pipe = uitars.get_pipeline()
+    assert pipe.processor.tokenizer.padding_side == "left"